@@ -0,0 +1,78 @@
+"""
+Benchmark del arranque de un servidor MCP stdio: tiempo desde que se lanza el
+proceso hasta que responde initialize y el primer tools/list.
+
+    python bench/startup.py --runs 10
+    python bench/startup.py mcp/server_db.py --runs 5
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from typing import Dict, List
+
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import stdio_client
+
+MCP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "mcp")
+
+
+async def time_startup(script: str) -> Dict[str, float]:
+    params = StdioServerParameters(
+        command=sys.executable,
+        args=[script],
+        cwd=os.path.dirname(script),
+        env=dict(os.environ),
+    )
+
+    start = time.perf_counter()
+
+    # Los logs del servidor (stderr) se descartan para no mezclarlos con la tabla
+    with open(os.devnull, "w") as errlog:
+        async with stdio_client(params, errlog=errlog) as (read, write):
+            async with ClientSession(read, write) as session:
+                await session.initialize()
+                initialized = time.perf_counter()
+
+                tools = await session.list_tools()
+                listed = time.perf_counter()
+
+    return {
+        "initialize": initialized - start,
+        "tools/list": listed - start,
+        "tools": len(tools.tools),
+    }
+
+
+async def main(args: argparse.Namespace) -> None:
+    script = os.path.abspath(args.server)
+    runs: List[Dict[str, float]] = []
+
+    for _ in range(args.runs):
+        runs.append(await time_startup(script))
+
+    name = os.path.basename(script)
+    print(f"{name}: {runs[0]['tools']} herramientas, {args.runs} arranques")
+    print(f"{'':<12} {'mediana':>9} {'mín':>9} {'máx':>9}  (s)")
+    for key in ("initialize", "tools/list"):
+        values = [run[key] for run in runs]
+        print(
+            f"{key:<12} {statistics.median(values):>9.3f} "
+            f"{min(values):>9.3f} {max(values):>9.3f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "server",
+        nargs="?",
+        default=os.path.join(MCP_DIR, "server_video.py"),
+        help="Script del servidor (por defecto mcp/server_video.py)",
+    )
+    parser.add_argument("--runs", type=int, default=5, help="Número de arranques")
+
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,136 @@
+"""
+Benchmark de la transcripción por segmentos de server_video.py en CPU.
+
+Transcribe un archivo de audio local con cada backend y número de workers y
+muestra el tiempo total y el factor de tiempo real (RTF = tiempo / duración del
+audio). Con --reference (texto correcto del audio) también calcula el word
+error rate (WER). El modelo se carga en cada worker antes de empezar a medir.
+
+    python bench/transcription.py audio.mp3 --model base --workers 1 2 4 \\
+        --backends whisper faster-whisper --reference audio.txt
+"""
+
+import argparse
+import asyncio
+import os
+import re
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "mcp")
+)
+
+from server_video import SAMPLE_RATE, Transcriber, resolve_backend  # noqa: E402
+
+
+async def audio_duration(path: str) -> float:
+    from whisper.audio import load_audio
+
+    audio = await asyncio.to_thread(load_audio, path)
+
+    return len(audio) / SAMPLE_RATE
+
+
+def normalize_words(text: str) -> List[str]:
+    # Minúsculas y sin puntuación, para comparar solo las palabras
+    return re.findall(r"\w+(?:'\w+)?", text.lower())
+
+
+def word_error_rate(reference: str, hypothesis: str) -> float:
+    # Distancia de edición por palabras (sustituciones, inserciones y
+    # eliminaciones) dividida por el número de palabras de la referencia
+    ref, hyp = normalize_words(reference), normalize_words(hypothesis)
+    previous = list(range(len(hyp) + 1))
+
+    for i, ref_word in enumerate(ref, start=1):
+        current = [i]
+        for j, hyp_word in enumerate(hyp, start=1):
+            current.append(
+                min(
+                    previous[j] + 1,
+                    current[j - 1] + 1,
+                    previous[j - 1] + (ref_word != hyp_word),
+                )
+            )
+        previous = current
+
+    return previous[-1] / max(len(ref), 1)
+
+
+async def run(path: str, model_name: str, workers: int, backend: str) -> Dict[str, Any]:
+    transcriber = Transcriber(
+        model_name=model_name, device="cpu", workers=workers, backend=backend
+    )
+
+    try:
+        await transcriber.warmup()
+
+        start = time.perf_counter()
+        transcript = await transcriber.transcribe_file(path, model_name)
+        elapsed = time.perf_counter() - start
+    finally:
+        # Los workers terminan antes de medir la configuración siguiente
+        transcriber.close(wait=True)
+
+    return {"workers": workers, "seconds": elapsed, "transcript": transcript}
+
+
+async def main(args: argparse.Namespace) -> None:
+    duration = await audio_duration(args.audio)
+    reference: Optional[str] = None
+
+    if args.reference:
+        with open(args.reference, encoding="utf-8") as f:
+            reference = f.read()
+
+    print(f"{args.audio}: {duration:.1f} s de audio, modelo '{args.model}'")
+    print(
+        f"{'backend':<15} {'workers':>8} {'tiempo (s)':>11} {'RTF':>7} "
+        f"{'speedup':>8} {'WER':>7}"
+    )
+
+    for backend in dict.fromkeys(resolve_backend(name) for name in args.backends):
+        results: List[Dict[str, Any]] = []
+
+        for workers in args.workers:
+            result = await run(args.audio, args.model, workers, backend)
+            results.append(result)
+
+            speedup = results[0]["seconds"] / result["seconds"]
+            wer = (
+                f"{word_error_rate(reference, result['transcript']['text']):.3f}"
+                if reference is not None
+                else "-"
+            )
+            print(
+                f"{backend:<15} {workers:>8} {result['seconds']:>11.1f} "
+                f"{result['seconds'] / duration:>7.3f} {speedup:>7.2f}x {wer:>7}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "audio", help="Archivo de audio local (cualquier formato de ffmpeg)"
+    )
+    parser.add_argument("--model", default="base", help="Tamaño del modelo")
+    parser.add_argument(
+        "--backends",
+        nargs="+",
+        default=["auto"],
+        help="Backends a comparar: auto, whisper o faster-whisper",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        nargs="+",
+        default=sorted({1, 2, os.cpu_count() or 1}),
+        help="Número de workers a comparar",
+    )
+    parser.add_argument(
+        "--reference", help="Archivo de texto con la transcripción correcta (WER)"
+    )
+
+    asyncio.run(main(parser.parse_args()))
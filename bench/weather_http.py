@@ -0,0 +1,140 @@
+"""
+Benchmark de la latencia por llamada de weather_client contra un servidor local.
+
+El servidor stub imita la API de Visual Crossing y simula la red: cada conexión
+nueva espera --handshake-ms (TCP + TLS) y cada petición --rtt-ms. Compara un
+httpx.AsyncClient nuevo por llamada con el cliente compartido del servidor
+(keep-alive, mismo pool de conexiones), sin pasar por la caché de respuestas.
+
+    python bench/weather_http.py --calls 100 --rtt-ms 20 --handshake-ms 60
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Awaitable, Callable, List
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "mcp")
+)
+
+import httpx  # noqa: E402
+
+from weather_client import WeatherClient, create_http_client  # noqa: E402
+
+PAYLOAD = json.dumps(
+    {
+        "resolvedAddress": "Madrid, España",
+        "timezone": "Europe/Madrid",
+        "currentConditions": {"temp": 21.3, "humidity": 40.0, "conditions": "Clear"},
+        "days": [{"tempmax": 25.1, "tempmin": 12.4, "conditions": "Clear"}],
+    }
+).encode()
+
+
+def start_stub_server(rtt: float, handshake: float) -> ThreadingHTTPServer:
+    class Handler(BaseHTTPRequestHandler):
+        # HTTP/1.1 para que los clientes puedan reutilizar la conexión
+        protocol_version = "HTTP/1.1"
+        # Cabeceras y cuerpo van en escrituras separadas: sin esto Nagle y el
+        # ACK retardado añaden ~40 ms a cada respuesta
+        disable_nagle_algorithm = True
+
+        def setup(self) -> None:
+            time.sleep(handshake)
+            super().setup()
+
+        def do_GET(self) -> None:
+            time.sleep(rtt)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(PAYLOAD)))
+            self.end_headers()
+            self.wfile.write(PAYLOAD)
+
+        def log_message(self, *args) -> None:
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    return server
+
+
+async def measure(call: Callable[[], Awaitable[None]], calls: int) -> List[float]:
+    await call()
+
+    latencies = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        await call()
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    return latencies
+
+
+async def main(args: argparse.Namespace) -> None:
+    server = start_stub_server(args.rtt_ms / 1000, args.handshake_ms / 1000)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    async def client_per_call() -> None:
+        # Lo que hacía fetch_weather antes: un cliente (y una conexión) por llamada
+        async with httpx.AsyncClient(base_url=base_url) as client:
+            resp = await client.get("/Madrid/today")
+            resp.raise_for_status()
+            resp.json()
+
+    weather = WeatherClient(client=create_http_client(base_url))
+
+    async def shared_client() -> None:
+        data = await weather._request("Madrid")
+        if "error" in data:
+            raise RuntimeError(data["error"])
+
+    results = {
+        "cliente por llamada": await measure(client_per_call, args.calls),
+        "cliente compartido": await measure(shared_client, args.calls),
+    }
+
+    await weather.close()
+    await weather.client.aclose()
+    server.shutdown()
+
+    print(
+        f"{args.calls} llamadas, RTT {args.rtt_ms:.0f} ms, "
+        f"handshake {args.handshake_ms:.0f} ms"
+    )
+    print(f"{'':<20} {'media':>8} {'p50':>8} {'p95':>8}  (ms)")
+    for name, latencies in results.items():
+        p95 = statistics.quantiles(latencies, n=20)[-1]
+        print(
+            f"{name:<20} {statistics.mean(latencies):>8.1f} "
+            f"{statistics.median(latencies):>8.1f} {p95:>8.1f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--calls", type=int, default=50, help="Llamadas por modo")
+    parser.add_argument(
+        "--rtt-ms", type=float, default=20, help="Latencia de cada petición"
+    )
+    parser.add_argument(
+        "--handshake-ms",
+        type=float,
+        default=60,
+        help="Latencia extra de cada conexión nueva (TCP + TLS)",
+    )
+    args = parser.parse_args()
+
+    # _request lee la clave en cada llamada; el stub no la valida
+    os.environ["WEATHER_API_KEY"] = "bench"
+
+    asyncio.run(main(args))
@@ -5,7 +5,6 @@ from uuid import uuid4
 
 from dotenv import load_dotenv
 from langchain_core.messages import AIMessageChunk, HumanMessage
-from langchain_mcp_adapters.client import MultiServerMCPClient
 from langchain_openai import ChatOpenAI
 
 from langgraph.checkpoint.memory import MemorySaver
@@ -13,6 +12,8 @@ from langgraph.graph import END, START, StateGraph
 from langgraph.graph.message import MessagesState
 from langgraph.prebuilt import ToolNode
 
+from mcp_sessions import MCPSessionManager
+
 load_dotenv(override=True)
 
 
@@ -55,9 +56,12 @@ async def main():
         }
     }
 
-    client = MultiServerMCPClient(mcp_servers)
+    # Los servidores se arrancan una vez y se reutilizan entre turnos; las
+    # herramientas salen de la caché en disco sin esperar a los servidores
+    sessions = MCPSessionManager(mcp_servers)
 
-    tools = await client.get_tools()
+    tools = await sessions.get_tools()
+    sessions.warm()
 
     model = ChatOpenAI(model="deepseek-chat", base_url="https://api.deepseek.com")
     model = model.bind_tools(tools)
@@ -97,7 +101,9 @@ async def main():
     thread = {"configurable": {"thread_id": uuid4()}}
 
     while True:
-        user_input = input("\n\nUSER: ")
+        # input() en un hilo para que los servidores sigan arrancando mientras
+        # el usuario escribe
+        user_input = await asyncio.to_thread(input, "\n\nUSER: ")
         if user_input in ["quit", "exit"]:
             break
 
@@ -111,6 +117,8 @@ async def main():
         ):
             print(response, end="", flush=True)
 
+    await sessions.close()
+
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -1,26 +1,139 @@
 import asyncio
-from typing import AsyncGenerator, Literal
+import json
+import os
+from typing import Annotated, Any, AsyncGenerator, Literal, Optional
 from uuid import uuid4
 
 from dotenv import load_dotenv
-from langchain_core.messages import AIMessageChunk, HumanMessage, SystemMessage
-from langchain_mcp_adapters.client import MultiServerMCPClient
+from langchain_core.messages import (
+    AIMessageChunk,
+    HumanMessage,
+    SystemMessage,
+    ToolMessage,
+)
 from langchain_openai import ChatOpenAI
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from typing_extensions import TypedDict
 
 from langgraph.checkpoint.memory import MemorySaver
 from langgraph.graph import END, START, StateGraph
 from langgraph.graph.message import MessagesState
 from langgraph.prebuilt import ToolNode
+from langgraph.types import Send
+
+from mcp_sessions import MCPSessionManager
 
 load_dotenv(override=True)
 
+# Las transcripciones más largas que SUMMARY_CHUNK_CHARS se dividen en partes
+# que se resumen en paralelo; al agente solo le llega el resumen combinado
+SUMMARY_CHUNK_CHARS = int(os.getenv("SUMMARY_CHUNK_CHARS") or "12000")
+SUMMARY_CHUNK_OVERLAP = int(os.getenv("SUMMARY_CHUNK_OVERLAP") or "300")
+
+map_prompt = """
+    Esta es la parte {index} de {total} de la transcripción de un video.
+
+    {text}
+
+    Extrae en viñetas, sin introducción: los temas tratados, los conceptos clave
+    con sus definiciones, los ejemplos o casos mencionados, las relaciones entre
+    ideas y las conclusiones o recomendaciones. Corrige los errores evidentes de
+    transcripción y conserva la terminología técnica.
+    """
+
+reduce_prompt = """
+    Estas son las notas, en orden, de las {total} partes de la transcripción de
+    un video:
+
+    {summaries}
+
+    Combínalas en un único análisis sin repetir ideas, con estas secciones:
+
+    ### Resumen Ejecutivo
+    Párrafo conciso (150-300 palabras) con los puntos más importantes.
+
+    ### Resumen Detallado
+    Análisis estructurado en secciones temáticas (500-800 palabras).
+
+    ### Mapa Conceptual
+    Diagrama Mermaid con las relaciones entre los conceptos principales.
+
+    ### Puntos Clave
+    Lista de 5-7 insights más importantes.
+
+    ### Insights Adicionales
+    Observaciones sobre la calidad del contenido y temas para profundizar.
+    """
+
+
+def merge_summaries(left: list, right: Optional[list]) -> list:
+    # None vacía la lista una vez combinados los resúmenes de la transcripción
+    if right is None:
+        return []
+
+    return left + right
+
+
+class VideoState(MessagesState):
+    summaries: Annotated[list, merge_summaries]
+
+
+class ChunkState(TypedDict):
+    message_id: str
+    index: int
+    total: int
+    text: str
+
+
+def tool_text(message: ToolMessage) -> str:
+    if isinstance(message.content, str):
+        return message.content
+
+    return "".join(
+        block if isinstance(block, str) else block.get("text", "")
+        for block in message.content
+    )
+
+
+def parse_transcript(message: ToolMessage) -> Optional[dict[str, Any]]:
+    # Resultado de download_youtube_video / get_transcription_result con la
+    # transcripción completa en "text"
+    try:
+        data = json.loads(tool_text(message))
+    except json.JSONDecodeError:
+        return None
+
+    if not isinstance(data, dict) or not isinstance(data.get("text"), str):
+        return None
+
+    return data
+
+
+def pending_transcripts(state: VideoState) -> list[tuple[ToolMessage, dict]]:
+    # Transcripciones largas devueltas por las herramientas en el último turno
+    transcripts = []
+
+    for message in reversed(state["messages"]):
+        if not isinstance(message, ToolMessage):
+            break
+
+        data = parse_transcript(message)
+        if data is not None and len(data["text"]) > SUMMARY_CHUNK_CHARS:
+            transcripts.append((message, data))
+
+    return transcripts
+
 
 async def stream_graph_response(
     input: MessagesState, graph: StateGraph, config: dict = {}
 ) -> AsyncGenerator[str, None]:
-    async for message_chunk, _ in graph.astream(
+    async for message_chunk, metadata in graph.astream(
         input=input, stream_mode="messages", config=config
     ):
+        # Los resúmenes parciales no se muestran, solo la respuesta del agente
+        if metadata.get("langgraph_node") != "agent":
+            continue
+
         if isinstance(message_chunk, AIMessageChunk):
             if message_chunk.response_metadata:
                 finish_reason = message_chunk.response_metadata.get("finish_reason", "")
@@ -53,14 +166,24 @@ async def main():
         }
     }
 
-    client = MultiServerMCPClient(mcp_servers)
+    # Los servidores se arrancan una vez y se reutilizan entre turnos; las
+    # herramientas salen de la caché en disco sin esperar a los servidores
+    sessions = MCPSessionManager(mcp_servers)
 
-    tools = await client.get_tools()
+    tools = await sessions.get_tools()
+    sessions.warm()
 
     model = ChatOpenAI(model="deepseek-chat", base_url="https://api.deepseek.com")
+    summarizer = model
     model = model.bind_tools(tools)
 
-    async def call_model(state: MessagesState):
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=SUMMARY_CHUNK_CHARS,
+        chunk_overlap=SUMMARY_CHUNK_OVERLAP,
+        separators=[". ", "? ", "! ", " ", ""],
+    )
+
+    async def call_model(state: VideoState):
         messages = state["messages"]
 
         system_prompt = """
@@ -191,7 +314,77 @@ async def main():
         )
         return {"messages": [response]}
 
-    def should_continue(state: MessagesState) -> Literal["tools", "__end__"]:
+    def route_tools(state: VideoState) -> list[Send] | Literal["agent"]:
+        # Map: cada parte de cada transcripción larga se resume en paralelo
+        sends = []
+
+        for message, data in pending_transcripts(state):
+            chunks = splitter.split_text(data["text"])
+
+            sends += [
+                Send(
+                    "summarize_chunk",
+                    {
+                        "message_id": message.id,
+                        "index": index,
+                        "total": len(chunks),
+                        "text": chunk,
+                    },
+                )
+                for index, chunk in enumerate(chunks, start=1)
+            ]
+
+        return sends or "agent"
+
+    async def summarize_chunk(state: ChunkState):
+        prompt = map_prompt.format(
+            index=state["index"], total=state["total"], text=state["text"]
+        )
+        response = await summarizer.ainvoke(prompt)
+
+        return {
+            "summaries": [
+                {
+                    "message_id": state["message_id"],
+                    "index": state["index"],
+                    "summary": response.content,
+                }
+            ]
+        }
+
+    async def reduce_summaries(state: VideoState):
+        # Reduce: combina los resúmenes parciales y reemplaza la transcripción
+        # completa (mismo id) para que no se reenvíe en cada turno
+        messages = []
+
+        for message, data in pending_transcripts(state):
+            summaries = sorted(
+                (s for s in state["summaries"] if s["message_id"] == message.id),
+                key=lambda s: s["index"],
+            )
+            prompt = reduce_prompt.format(
+                total=len(summaries),
+                summaries="\n\n".join(
+                    f"Parte {s['index']}:\n{s['summary']}" for s in summaries
+                ),
+            )
+            response = await summarizer.ainvoke(prompt)
+
+            artifact = {k: v for k, v in data.items() if k not in ("text", "segments")}
+            artifact["summary"] = response.content
+
+            messages.append(
+                ToolMessage(
+                    content=json.dumps(artifact, ensure_ascii=False),
+                    tool_call_id=message.tool_call_id,
+                    name=message.name,
+                    id=message.id,
+                )
+            )
+
+        return {"messages": messages, "summaries": None}
+
+    def should_continue(state: VideoState) -> Literal["tools", "__end__"]:
         messages = state["messages"]
         last_message = messages[-1]
 
@@ -202,14 +395,18 @@ async def main():
 
     tool_node = ToolNode(tools=tools)
 
-    workflow = StateGraph(MessagesState)
+    workflow = StateGraph(VideoState)
 
     workflow.add_node("agent", call_model)
     workflow.add_node("tools", tool_node)
+    workflow.add_node("summarize_chunk", summarize_chunk)
+    workflow.add_node("reduce_summaries", reduce_summaries)
 
     workflow.add_edge(START, "agent")
     workflow.add_conditional_edges("agent", should_continue)
-    workflow.add_edge("tools", "agent")
+    workflow.add_conditional_edges("tools", route_tools, ["summarize_chunk", "agent"])
+    workflow.add_edge("summarize_chunk", "reduce_summaries")
+    workflow.add_edge("reduce_summaries", "agent")
     workflow.add_edge("agent", END)
 
     memory = MemorySaver()
@@ -221,7 +418,9 @@ async def main():
     thread = {"configurable": {"thread_id": uuid4()}}
 
     while True:
-        user_input = input("\n\nUSER: ")
+        # input() en un hilo para que los servidores sigan arrancando mientras
+        # el usuario escribe
+        user_input = await asyncio.to_thread(input, "\n\nUSER: ")
         if user_input in ["quit", "exit"]:
             break
 
@@ -235,6 +434,8 @@ async def main():
         ):
             print(response, end="", flush=True)
 
+    await sessions.close()
+
 
 if __name__ == "__main__":
     asyncio.run(main())
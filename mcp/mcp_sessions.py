@@ -0,0 +1,210 @@
+import asyncio
+import hashlib
+import json
+import os
+from typing import Any, Dict, List
+
+import anyio
+from dotenv import load_dotenv
+from langchain_core.tools import BaseTool
+from langchain_mcp_adapters.client import MultiServerMCPClient
+from langchain_mcp_adapters.tools import convert_mcp_tool_to_langchain_tool
+
+from mcp import ClientSession
+from mcp.types import CallToolResult
+from mcp.types import Tool as MCPTool
+
+load_dotenv(override=True)
+
+# Esquemas de las herramientas de cada servidor guardados en disco: con ellos el
+# grafo se compila sin arrancar los servidores (server_video.py tarda varios
+# segundos solo en importar torch y whisper)
+MCP_TOOL_CACHE_PATH = os.getenv("MCP_TOOL_CACHE_PATH") or os.path.join(
+    os.path.expanduser("~"), ".cache", "agent-notes", "mcp_tools.json"
+)
+
+
+def server_fingerprint(connection: Dict[str, Any]) -> str:
+    # Cambia si cambia la configuración del servidor (sin los valores de env,
+    # que pueden ser secretos) o si se modifica su script
+    config = {k: v for k, v in connection.items() if k != "env"}
+    scripts = [
+        os.path.getmtime(arg)
+        for arg in connection.get("args", [])
+        if isinstance(arg, str) and arg.endswith(".py") and os.path.exists(arg)
+    ]
+
+    payload = json.dumps([config, sorted(connection.get("env") or {}), scripts])
+
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class LazySession:
+    """Sesión que se conecta al servidor en la primera llamada a una herramienta."""
+
+    def __init__(self, manager: "MCPSessionManager", server: str) -> None:
+        self.manager = manager
+        self.server = server
+
+    async def call_tool(self, name: str, arguments: Dict[str, Any]) -> CallToolResult:
+        session = await self.manager.session(self.server)
+
+        try:
+            return await session.call_tool(name, arguments)
+        except (
+            anyio.ClosedResourceError,
+            anyio.BrokenResourceError,
+            ConnectionError,
+        ):
+            # La sesión murió con el servidor: la siguiente llamada reconecta. Los
+            # errores de la herramienta (o un timeout) no invalidan la sesión
+            self.manager.discard(self.server)
+            raise
+
+
+class MCPSessionManager:
+    """Mantiene una sesión por servidor MCP abierta entre ejecuciones del grafo.
+
+    MultiServerMCPClient.get_tools() abre una sesión nueva (y lanza un proceso
+    nuevo con stdio) en cada llamada a una herramienta. Aquí cada servidor se
+    arranca una sola vez, en su propia tarea para que el contexto de la sesión se
+    abra y cierre en la misma tarea, y se reutiliza hasta close().
+    """
+
+    def __init__(
+        self,
+        connections: Dict[str, Dict[str, Any]],
+        cache_path: str = MCP_TOOL_CACHE_PATH,
+    ) -> None:
+        self.client = MultiServerMCPClient(connections)
+        self.connections = connections
+        self.cache_path = cache_path
+        self.sessions: Dict[str, asyncio.Future] = {}
+        self.tasks: Dict[str, asyncio.Task] = {}
+        self.stopping = asyncio.Event()
+        self.warming: set = set()
+
+    async def session(self, server: str) -> ClientSession:
+        if server not in self.sessions:
+            ready = asyncio.get_running_loop().create_future()
+            self.sessions[server] = ready
+            self.tasks[server] = asyncio.create_task(self._run(server, ready))
+
+        ready = self.sessions[server]
+
+        try:
+            # shield: cancelar una llamada no cancela la conexión compartida
+            return await asyncio.shield(ready)
+        except asyncio.CancelledError:
+            if ready.cancelled():
+                raise ConnectionError(
+                    f"Se cerró la conexión con el servidor MCP '{server}'"
+                ) from None
+            raise
+
+    async def _run(self, server: str, ready: asyncio.Future) -> None:
+        try:
+            async with self.client.session(server) as session:
+                ready.set_result(session)
+                await self.stopping.wait()
+        except Exception as e:
+            # Si la sesión muere después de conectar, la siguiente llamada reconecta
+            if not ready.done():
+                ready.set_exception(e)
+        finally:
+            if not ready.done():
+                ready.cancel()
+
+            if self.sessions.get(server) is ready:
+                del self.sessions[server]
+                del self.tasks[server]
+
+    def discard(self, server: str) -> None:
+        self.sessions.pop(server, None)
+        task = self.tasks.pop(server, None)
+
+        if task is not None:
+            task.cancel()
+
+    def warm(self) -> None:
+        # Arranca los servidores en segundo plano mientras el usuario escribe
+        for server in self.connections:
+            if server not in self.sessions:
+                task = asyncio.create_task(self._warm(server))
+                self.warming.add(task)
+                task.add_done_callback(self.warming.discard)
+
+    async def _warm(self, server: str) -> None:
+        try:
+            await self.session(server)
+        except Exception as e:
+            print(f"No se pudo conectar con el servidor MCP '{server}': {e}")
+
+    async def get_tools(self) -> List[BaseTool]:
+        cache = self._load_cache()
+        updated = False
+        tools = []
+
+        for server, connection in self.connections.items():
+            fingerprint = server_fingerprint(connection)
+            entry = cache.get(server)
+
+            if entry is None or entry["fingerprint"] != fingerprint:
+                session = await self.session(server)
+                mcp_tools = await self._list_tools(session)
+
+                entry = {
+                    "fingerprint": fingerprint,
+                    "tools": [
+                        tool.model_dump(mode="json", exclude_none=True)
+                        for tool in mcp_tools
+                    ],
+                }
+                cache[server] = entry
+                updated = True
+
+            tools += [
+                convert_mcp_tool_to_langchain_tool(
+                    LazySession(self, server), MCPTool.model_validate(tool)
+                )
+                for tool in entry["tools"]
+            ]
+
+        if updated:
+            self._save_cache(cache)
+
+        return tools
+
+    async def _list_tools(self, session: ClientSession) -> List[MCPTool]:
+        tools = []
+        cursor = None
+
+        while True:
+            page = await session.list_tools(cursor=cursor)
+            tools += page.tools
+
+            if not page.nextCursor:
+                return tools
+
+            cursor = page.nextCursor
+
+    def _load_cache(self) -> Dict[str, Any]:
+        try:
+            with open(self.cache_path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_cache(self, cache: Dict[str, Any]) -> None:
+        os.makedirs(os.path.dirname(self.cache_path) or ".", exist_ok=True)
+
+        # Escritura atómica para no dejar un archivo a medias si se interrumpe
+        tmp_path = f"{self.cache_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(cache, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.cache_path)
+
+    async def close(self) -> None:
+        self.stopping.set()
+
+        await asyncio.gather(*self.tasks.values(), return_exceptions=True)
@@ -1,59 +1,701 @@
+import asyncio
+import base64
+import csv
+import datetime
+import decimal
+import hashlib
+import io
+import json
+import logging
+import os
+import re
+import time
+import uuid
+from collections import OrderedDict
 from collections.abc import AsyncIterator
 from contextlib import asynccontextmanager
-from dataclasses import dataclass
-from typing import Any, Dict, List
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Union
 
-import psycopg2
-import psycopg2.extensions
-from psycopg2.extras import DictCursor as dict_row
+from dotenv import load_dotenv
+from psycopg import AsyncConnection, errors, sql
+from psycopg.rows import dict_row
+from psycopg_pool import AsyncConnectionPool
 
 from mcp.server.fastmcp import Context, FastMCP
 
+load_dotenv(override=True)
+
+# stdout es el canal JSON-RPC del transporte stdio: los avisos van a stderr
+logger = logging.getLogger(__name__)
+
+DATABASE_URL = (
+    os.getenv("DATABASE_URL")
+    or "host=localhost dbname=postgres user=admin password=admin123"
+)
+
+# Tamaño del pool: min_size conexiones se abren al iniciar, hasta max_size bajo carga
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE") or "1")
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE") or "10")
+
+# Segundos que una herramienta espera por una conexión libre antes de fallar.
+# max_size acota cuántas consultas pueden estar en curso a la vez
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT") or "30")
+
+# Filas por página en execute_query y máximo que puede pedir el agente
+DB_PAGE_SIZE = int(os.getenv("DB_PAGE_SIZE") or "50")
+DB_MAX_PAGE_SIZE = int(os.getenv("DB_MAX_PAGE_SIZE") or "500")
+
+# Prepared statements: psycopg prepara en el servidor una consulta (por conexión
+# del pool, según su texto) a partir de su ejecución número DB_PREPARE_THRESHOLD
+# y guarda hasta DB_PREPARED_MAX por conexión. Así las consultas frecuentes se
+# saltan el parseo y la planificación.
+DB_PREPARE_THRESHOLD = int(os.getenv("DB_PREPARE_THRESHOLD") or "2")
+DB_PREPARED_MAX = int(os.getenv("DB_PREPARED_MAX") or "256")
+
+# Caché opcional de resultados de execute_query (se activa con use_cache=True):
+# duración de cada entrada y límites de memoria (entradas y bytes aproximados)
+DB_RESULT_CACHE_TTL = float(os.getenv("DB_RESULT_CACHE_TTL") or "60")
+DB_RESULT_CACHE_MAX_ENTRIES = int(os.getenv("DB_RESULT_CACHE_MAX_ENTRIES") or "256")
+DB_RESULT_CACHE_MAX_BYTES = int(
+    os.getenv("DB_RESULT_CACHE_MAX_BYTES") or str(16 * 1024 * 1024)
+)
+
+# statement_timeout por tipo de herramienta, en milisegundos. El de lectura es
+# el valor por defecto de cada conexión; escrituras y cargas masivas lo
+# sobrescriben con SET LOCAL solo dentro de su transacción.
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS") or "15000")
+DB_WRITE_TIMEOUT_MS = int(os.getenv("DB_WRITE_TIMEOUT_MS") or "30000")
+DB_BULK_TIMEOUT_MS = int(os.getenv("DB_BULK_TIMEOUT_MS") or "300000")
+
+# Control de admisión de execute_query: antes de ejecutar se consulta EXPLAIN de
+# la consulta paginada y si su costo o las filas estimadas de algún nodo (p. ej.
+# un JOIN sin condición) superan el umbral la consulta se rechaza ("reject"),
+# se ejecuta con una advertencia ("warn") o no se revisa ("off")
+DB_COST_GUARD = os.getenv("DB_COST_GUARD") or "reject"
+DB_MAX_QUERY_COST = float(os.getenv("DB_MAX_QUERY_COST") or "1000000")
+DB_MAX_QUERY_ROWS = float(os.getenv("DB_MAX_QUERY_ROWS") or "10000000")
+
+# Filas por lote en insert_records; cada lote es un SAVEPOINT dentro de la transacción
+DB_INSERT_BATCH_SIZE = int(os.getenv("DB_INSERT_BATCH_SIZE") or "1000")
+
+# Segundos que list_tables / get_table_info reutilizan el esquema en memoria
+DB_SCHEMA_CACHE_TTL = float(os.getenv("DB_SCHEMA_CACHE_TTL") or "300")
+
+# Con DB_SCHEMA_LISTEN=1 el servidor escucha NOTIFY para invalidar la caché
+# cuando otro cliente cambia el esquema (requiere el event trigger de abajo)
+DB_SCHEMA_LISTEN = (os.getenv("DB_SCHEMA_LISTEN") or "0") == "1"
+SCHEMA_CHANNEL = "mcp_schema_changed"
+
+# Se instala al iniciar si DB_SCHEMA_LISTEN=1. Crear event triggers requiere
+# superusuario; si falla, se puede ejecutar manualmente una sola vez.
+SCHEMA_EVENT_TRIGGER_SQL = f"""
+CREATE OR REPLACE FUNCTION mcp_notify_schema_change() RETURNS event_trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    PERFORM pg_notify('{SCHEMA_CHANNEL}', tg_tag);
+END;
+$$;
+
+DROP EVENT TRIGGER IF EXISTS mcp_schema_change;
+
+CREATE EVENT TRIGGER mcp_schema_change ON ddl_command_end
+EXECUTE FUNCTION mcp_notify_schema_change();
+"""
+
+QueryParams = Union[Dict[str, Any], List[Any]]
+
+# Literales y comentarios se reconocen primero para no alterar su contenido.
+# En los literales E'...' la barra invertida escapa la comilla siguiente.
+_SQL_TOKEN_RE = re.compile(
+    r"""\b[eE]'(?:[^'\\]|\\.|'')*'|'(?:[^']|'')*'|"(?:[^"]|"")*"|\$(\w*)\$.*?\$\1\$"""
+    r"""|(?:\s|--[^\n]*|/\*.*?\*/)+""",
+    re.DOTALL,
+)
+
+
+def _normalize_sql(query_str: str) -> str:
+    # Colapsa espacios y quita comentarios fuera de los literales, para que la
+    # misma consulta escrita con distinto formato comparta prepared statement
+    def replace(match: re.Match) -> str:
+        token = match.group(0)
+        if token[0] in "'\"$eE":
+            return token
+        return " "
+
+    return _SQL_TOKEN_RE.sub(replace, query_str).strip().rstrip(";").strip()
+
+
+def _paged_query(
+    query_str: str, params: Optional[QueryParams], limit: int, offset: int
+) -> tuple[str, QueryParams]:
+    # LIMIT y OFFSET viajan como parámetros: el texto de la consulta no cambia
+    # entre páginas y psycopg reutiliza el mismo prepared statement
+    if isinstance(params, dict):
+        placeholders = "%(_page_limit)s", "%(_page_offset)s"
+        params = {**params, "_page_limit": limit, "_page_offset": offset}
+    else:
+        placeholders = "%s", "%s"
+        if params is None:
+            # Sin parámetros psycopg no interpreta '%'; con ellos hay que escaparlo
+            query_str = query_str.replace("%", "%%")
+        params = [*(params or []), limit, offset]
+
+    paged_query = (
+        f"SELECT * FROM ({query_str}) AS _page "
+        f"LIMIT {placeholders[0]} OFFSET {placeholders[1]}"
+    )
+
+    return paged_query, params
+
+
+def _query_fingerprint(query_str: str, params: Optional[QueryParams] = None) -> str:
+    key = query_str + json.dumps(params, sort_keys=True, default=str)
+    return hashlib.sha256(key.encode()).hexdigest()[:16]
+
+
+def _encode_cursor(query_str: str, params: Optional[QueryParams], offset: int) -> str:
+    payload = json.dumps({"q": _query_fingerprint(query_str, params), "offset": offset})
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def _decode_cursor(query_str: str, params: Optional[QueryParams], cursor: str) -> int:
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        offset = int(payload["offset"])
+    except (ValueError, KeyError, TypeError):
+        raise ValueError("Cursor de paginación inválido")
+
+    # El cursor solo es válido para la misma consulta que lo generó
+    if payload.get("q") != _query_fingerprint(query_str, params) or offset < 0:
+        raise ValueError("El cursor no corresponde a esta consulta")
+
+    return offset
+
+
+def _plan_relations(plan: Dict[str, Any]) -> set[str]:
+    # Tablas que lee un plan de EXPLAIN (FORMAT JSON), incluidas las de las vistas
+    relations = set()
+
+    if "Relation Name" in plan:
+        relations.add(plan["Relation Name"].lower())
+
+    for child in plan.get("Plans", []):
+        relations |= _plan_relations(child)
+
+    return relations
+
+
+def _max_plan_rows(plan: Dict[str, Any]) -> float:
+    # Filas estimadas del nodo más grande del plan. El Limit de la paginación
+    # acota las del nodo raíz, pero no las de un JOIN sin condición debajo
+    return max(
+        [plan["Plan Rows"], *(_max_plan_rows(child) for child in plan.get("Plans", []))]
+    )
+
+
+# Nodos cuyo resultado sale en un orden definido
+ORDERED_PLAN_NODES = {
+    "Sort",
+    "Incremental Sort",
+    "Index Scan",
+    "Index Only Scan",
+    "Gather Merge",
+    "Merge Append",
+}
+
+
+def _plan_is_ordered(plan: Dict[str, Any]) -> bool:
+    # Sin Sort ni recorrido de índice, PostgreSQL puede devolver las filas en
+    # otro orden en cada ejecución y el OFFSET del cursor repetir u omitir filas
+    return plan["Node Type"] in ORDERED_PLAN_NODES or any(
+        _plan_is_ordered(child) for child in plan.get("Plans", [])
+    )
+
+
+def _check_query_cost(plan: Dict[str, Any]) -> Optional[str]:
+    if DB_COST_GUARD == "off":
+        return None
+
+    # El costo del nodo raíz ya incluye lo que el Limit no evita (Sort, agregados)
+    cost, rows = plan["Total Cost"], _max_plan_rows(plan)
+
+    if cost <= DB_MAX_QUERY_COST and rows <= DB_MAX_QUERY_ROWS:
+        return None
+
+    message = (
+        f"Consulta demasiado costosa según EXPLAIN (costo {cost:.0f}, "
+        f"~{rows:.0f} filas; límites {DB_MAX_QUERY_COST:.0f} y "
+        f"{DB_MAX_QUERY_ROWS:.0f}). Agrega filtros, LIMIT o condiciones de JOIN."
+    )
+
+    if DB_COST_GUARD == "reject":
+        raise ValueError(message)
+
+    return message
+
+
+def _table_identifier(table_name: str) -> sql.Identifier:
+    # Admite "tabla" o "esquema.tabla"
+    return sql.Identifier(*table_name.split("."))
+
+
+def _parse_records(content: str, content_format: str) -> List[Dict[str, Any]]:
+    if content_format == "csv":
+        records = []
+
+        # En CSV no hay NULL: un campo vacío se inserta como NULL y no como ''
+        # (que fallaría en columnas numéricas o de fecha). DictReader agrupa los
+        # campos sobrantes bajo la clave None, que no es una columna válida.
+        reader = csv.DictReader(io.StringIO(content))
+        for record in reader:
+            if None in record:
+                raise ValueError(
+                    f"La línea {reader.line_num} del CSV tiene más campos "
+                    "que el encabezado"
+                )
+            records.append(
+                {key: None if value == "" else value for key, value in record.items()}
+            )
+
+        return records
+
+    if content_format == "jsonl":
+        return [json.loads(line) for line in content.splitlines() if line.strip()]
+
+    raise ValueError(f"Formato no soportado: '{content_format}' (usa 'csv' o 'jsonl')")
+
+
+def _serialize_value(value: Any) -> Any:
+    # Tipos de PostgreSQL sin representación JSON directa. Decimal va como texto
+    # para no perder precisión; bytea como hex con el mismo formato '\x' de Postgres.
+    if isinstance(value, decimal.Decimal):
+        return str(value)
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, datetime.timedelta):
+        return str(value)
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return "\\x" + bytes(value).hex()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+
+    return value
+
+
+def _format_result(result: Dict[str, Any], output_format: str) -> Dict[str, Any]:
+    # 'objects' repite los nombres de columna en cada fila; 'columnar' los envía
+    # una sola vez y 'csv'/'tsv' reducen aún más el payload y los tokens del LLM
+    columns = result["columns"]
+    rows = [
+        [_serialize_value(row[column]) for column in columns] for row in result["rows"]
+    ]
+    formatted = {key: value for key, value in result.items() if key != "rows"}
+
+    if output_format == "objects":
+        formatted["rows"] = [dict(zip(columns, row)) for row in rows]
+    elif output_format == "columnar":
+        formatted["rows"] = rows
+    elif output_format in ("csv", "tsv"):
+        buffer = io.StringIO()
+        writer = csv.writer(
+            buffer,
+            delimiter="," if output_format == "csv" else "\t",
+            lineterminator="\n",
+        )
+        writer.writerow(columns)
+        writer.writerows(
+            [
+                json.dumps(value) if isinstance(value, (dict, list)) else value
+                for value in row
+            ]
+            for row in rows
+        )
+        del formatted["columns"]
+        formatted[output_format] = buffer.getvalue()
+    else:
+        raise ValueError(
+            f"Formato no soportado: '{output_format}' "
+            "(usa 'objects', 'columnar', 'csv' o 'tsv')"
+        )
+
+    return formatted
+
+
+# Una sola consulta al catálogo con todas las tablas del esquema 'public':
+# columnas, claves primarias y foráneas, índices y filas estimadas (reltuples,
+# sin COUNT(*)). Las subconsultas correlacionadas viajan en el mismo round-trip.
+DESCRIBE_SCHEMA_SQL = """
+SELECT
+    c.relname AS table_name,
+    GREATEST(c.reltuples, 0)::bigint AS estimated_rows,
+    COALESCE((
+        SELECT json_agg(json_build_object(
+            'column_name', a.attname,
+            'data_type', format_type(a.atttypid, a.atttypmod),
+            'is_nullable', NOT a.attnotnull,
+            'column_default', pg_get_expr(d.adbin, d.adrelid)
+        ) ORDER BY a.attnum)
+        FROM pg_attribute a
+        LEFT JOIN pg_attrdef d ON d.adrelid = a.attrelid AND d.adnum = a.attnum
+        WHERE a.attrelid = c.oid AND a.attnum > 0 AND NOT a.attisdropped
+    ), '[]'::json) AS columns,
+    COALESCE((
+        SELECT json_agg(a.attname ORDER BY array_position(con.conkey, a.attnum))
+        FROM pg_constraint con
+        JOIN pg_attribute a
+            ON a.attrelid = con.conrelid AND a.attnum = ANY (con.conkey)
+        WHERE con.conrelid = c.oid AND con.contype = 'p'
+    ), '[]'::json) AS primary_key,
+    COALESCE((
+        SELECT json_agg(json_build_object(
+            'name', con.conname,
+            'references', con.confrelid::regclass::text,
+            'definition', pg_get_constraintdef(con.oid)
+        ))
+        FROM pg_constraint con
+        WHERE con.conrelid = c.oid AND con.contype = 'f'
+    ), '[]'::json) AS foreign_keys,
+    COALESCE((
+        SELECT json_agg(json_build_object(
+            'name', i.relname,
+            'definition', pg_get_indexdef(ix.indexrelid)
+        ))
+        FROM pg_index ix
+        JOIN pg_class i ON i.oid = ix.indexrelid
+        WHERE ix.indrelid = c.oid
+    ), '[]'::json) AS indexes
+FROM pg_class c
+JOIN pg_namespace n ON n.oid = c.relnamespace
+WHERE n.nspname = 'public'
+    AND c.relkind IN ('r', 'p')
+    AND (%(tables)s::text[] IS NULL OR c.relname = ANY (%(tables)s::text[]))
+ORDER BY c.relname
+"""
+
+
+@dataclass
+class SchemaCache:
+    ttl: float
+    entries: Dict[str, tuple[float, Any]] = field(default_factory=dict)
+
+    def get(self, key: str) -> Any:
+        entry = self.entries.get(key)
+
+        if entry is None:
+            return None
+
+        expires_at, value = entry
+        if time.monotonic() >= expires_at:
+            del self.entries[key]
+            return None
+
+        return value
+
+    def set(self, key: str, value: Any) -> None:
+        self.entries[key] = (time.monotonic() + self.ttl, value)
+
+    def invalidate(self) -> None:
+        self.entries.clear()
+
+
+@dataclass
+class ResultCacheEntry:
+    expires_at: float
+    size: int
+    tables: set[str]
+    value: Dict[str, Any]
+
+
+@dataclass
+class ResultCache:
+    ttl: float
+    max_entries: int
+    max_bytes: int
+    entries: OrderedDict[str, ResultCacheEntry] = field(default_factory=OrderedDict)
+    total_bytes: int = 0
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    invalidations: int = 0
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self.entries.get(key)
+
+        if entry is None or time.monotonic() >= entry.expires_at:
+            if entry is not None:
+                self._remove(key)
+            self.misses += 1
+            return None
+
+        # LRU: la entrada usada pasa al final y se expulsa por el principio
+        self.entries.move_to_end(key)
+        self.hits += 1
+
+        return entry.value
+
+    def set(self, key: str, value: Dict[str, Any], tables: set[str]) -> None:
+        size = len(json.dumps(value, default=str))
+
+        if size > self.max_bytes:
+            return
+
+        if key in self.entries:
+            self._remove(key)
+
+        self.entries[key] = ResultCacheEntry(
+            expires_at=time.monotonic() + self.ttl,
+            size=size,
+            tables=tables,
+            value=value,
+        )
+        self.total_bytes += size
+
+        while len(self.entries) > self.max_entries or self.total_bytes > self.max_bytes:
+            self._remove(next(iter(self.entries)))
+            self.evictions += 1
+
+    def invalidate_table(self, table_name: str) -> None:
+        table = table_name.split(".")[-1].lower()
+
+        for key in [k for k, e in self.entries.items() if table in e.tables]:
+            self._remove(key)
+            self.invalidations += 1
+
+    def clear(self) -> None:
+        self.invalidations += len(self.entries)
+        self.entries.clear()
+        self.total_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+
+        return {
+            "entries": len(self.entries),
+            "bytes": self.total_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+    def _remove(self, key: str) -> None:
+        entry = self.entries.pop(key)
+        self.total_bytes -= entry.size
+
 
 @dataclass
 class Database:
-    conn: psycopg2.extensions.connection
+    pool: AsyncConnectionPool
+    schema_cache: SchemaCache = field(
+        default_factory=lambda: SchemaCache(ttl=DB_SCHEMA_CACHE_TTL)
+    )
+    result_cache: ResultCache = field(
+        default_factory=lambda: ResultCache(
+            ttl=DB_RESULT_CACHE_TTL,
+            max_entries=DB_RESULT_CACHE_MAX_ENTRIES,
+            max_bytes=DB_RESULT_CACHE_MAX_BYTES,
+        )
+    )
+    schema_listener: Optional[asyncio.Task] = None
+
+    @staticmethod
+    async def configure_connection(conn: AsyncConnection) -> None:
+        conn.prepared_max = DB_PREPARED_MAX
+
+        await conn.execute(f"SET statement_timeout = {DB_STATEMENT_TIMEOUT_MS}")
+        await conn.commit()
+
+    @staticmethod
+    async def set_statement_timeout(conn: AsyncConnection, timeout_ms: int) -> None:
+        # set_config(..., true) equivale a SET LOCAL: vuelve al valor por
+        # defecto de la conexión al terminar la transacción
+        if timeout_ms != DB_STATEMENT_TIMEOUT_MS:
+            await conn.execute(
+                "SELECT set_config('statement_timeout', %s, true)", [str(timeout_ms)]
+            )
 
     @classmethod
     async def connect(cls) -> "Database":
-        conn = psycopg2.connect(
-            host="localhost", database="postgres", user="admin", password="admin123"
+        # check: cada conexión se valida antes de entregarse; si está rota se
+        # descarta y el pool abre otra en segundo plano (reconexión automática)
+        pool = AsyncConnectionPool(
+            conninfo=DATABASE_URL,
+            min_size=DB_POOL_MIN_SIZE,
+            max_size=DB_POOL_MAX_SIZE,
+            timeout=DB_POOL_TIMEOUT,
+            check=AsyncConnectionPool.check_connection,
+            kwargs={"prepare_threshold": DB_PREPARE_THRESHOLD},
+            configure=cls.configure_connection,
+            open=False,
         )
-        return cls(conn)
+        await pool.open(wait=True)
 
-    async def disconnect(self) -> None:
-        self.conn.close()
+        db = cls(pool)
 
-    def execute_query(self, query_str: str) -> List[Dict[str, Any]]:
-        with self.conn.cursor(cursor_factory=dict_row) as cur:
-            cur.execute(query_str)
+        if DB_SCHEMA_LISTEN:
+            db.schema_listener = asyncio.create_task(db.listen_schema_changes())
 
-            if cur.description is None:
-                return {"error": "La consulta no devolvió resultados (no es SELECT)"}
+        return db
 
-            columns = [desc.name for desc in cur.description]
-            rows = cur.fetchall()
-            rows_dict = [dict(row) for row in rows]
+    async def disconnect(self) -> None:
+        if self.schema_listener is not None:
+            self.schema_listener.cancel()
 
-            return {
-                "columns": columns,
-                "rows": rows_dict[:50],
-            }
+        await self.pool.close()
 
-    def execute_non_query(self, query_str: str) -> Dict[str, Any]:
+    async def listen_schema_changes(self) -> None:
         try:
-            with self.conn.cursor() as cur:
-                cur.execute(query_str)
+            async with self.pool.connection() as conn:
+                await conn.execute(SCHEMA_EVENT_TRIGGER_SQL)
+        except Exception as e:
+            logger.warning("No se pudo instalar el event trigger de esquema: %s", e)
+
+        # Conexión dedicada fuera del pool: LISTEN necesita autocommit y
+        # mantenerse abierta. Si se cae, se reconecta y se invalida la caché
+        # porque pudieron perderse notificaciones mientras tanto.
+        while True:
+            try:
+                async with await AsyncConnection.connect(
+                    DATABASE_URL, autocommit=True
+                ) as conn:
+                    await conn.execute(f"LISTEN {SCHEMA_CHANNEL}")
+                    self.schema_cache.invalidate()
+                    self.result_cache.clear()
+
+                    async for _ in conn.notifies():
+                        self.schema_cache.invalidate()
+                        self.result_cache.clear()
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Error escuchando cambios de esquema: %s", e)
+                await asyncio.sleep(5)
+
+    # Las consultas usan el driver async de psycopg, así que no bloquean el
+    # event loop de FastMCP. Si el cliente cancela la petición, la tarea recibe
+    # CancelledError y psycopg envía la cancelación al servidor antes de
+    # devolver la conexión al pool. Si la cancelación no llega al servidor,
+    # statement_timeout corta la consulta de todas formas.
+    async def fetch_all(
+        self, query_str: str, params: Optional[QueryParams] = None
+    ) -> Dict[str, Any]:
+        async with self.pool.connection() as conn:
+            async with conn.cursor(row_factory=dict_row) as cur:
+                await cur.execute(_normalize_sql(query_str), params)
+
+                if cur.description is None:
+                    return {
+                        "error": "La consulta no devolvió resultados (no es SELECT)"
+                    }
+
+                columns = [desc.name for desc in cur.description]
+                rows = await cur.fetchall()
+
+                return {"columns": columns, "rows": rows}
+
+    async def execute_query(
+        self,
+        query_str: str,
+        params: Optional[QueryParams] = None,
+        page_size: int = DB_PAGE_SIZE,
+        cursor: Optional[str] = None,
+        use_cache: bool = False,
+    ) -> Dict[str, Any]:
+        query_str = _normalize_sql(query_str)
+        page_size = max(1, min(page_size, DB_MAX_PAGE_SIZE))
+        offset = _decode_cursor(query_str, params, cursor) if cursor else 0
+
+        cache_key = f"{_query_fingerprint(query_str, params)}:{page_size}:{offset}"
+        if use_cache:
+            cached = self.result_cache.get(cache_key)
+            if cached is not None:
+                return {**cached, "cached": True}
+
+        # El LIMIT se aplica en PostgreSQL: solo viajan page_size + 1 filas
+        # (la extra indica si hay más páginas), sin importar el tamaño de la tabla
+        paged_query, paged_params = _paged_query(
+            query_str, params, page_size + 1, offset
+        )
 
-                self.conn.commit()
+        async with self.pool.connection() as conn:
+            async with conn.cursor(row_factory=dict_row) as cur:
+                # Se revisa el plan de la consulta que realmente se ejecuta, con
+                # su LIMIT; el nodo hijo del Limit da el total estimado de filas
+                await cur.execute(f"EXPLAIN (FORMAT JSON) {paged_query}", paged_params)
+                plan = (await cur.fetchone())["QUERY PLAN"][0]["Plan"]
+                unlimited = plan["Plans"][0] if plan["Node Type"] == "Limit" else plan
+                total_estimate = unlimited["Plan Rows"]
+                warning = _check_query_cost(plan)
+
+                try:
+                    await cur.execute(paged_query, paged_params)
+                except errors.FeatureNotSupported:
+                    # psycopg solo olvida sus sentencias preparadas en la conexión
+                    # que ejecutó el DDL; en las demás del pool, tras recrear una
+                    # tabla con otras columnas, el plan guardado falla con "cached
+                    # plan must not change result type". DEALLOCATE ALL vacía el
+                    # caché del servidor y el de psycopg, y se reintenta una vez
+                    await conn.rollback()
+                    await conn.execute("DEALLOCATE ALL")
+                    await cur.execute(paged_query, paged_params)
+
+                columns = [desc.name for desc in cur.description]
+                rows = await cur.fetchmany(page_size + 1)
+
+        truncated = len(rows) > page_size
+        rows = rows[:page_size]
+
+        if truncated and not _plan_is_ordered(unlimited):
+            unordered = (
+                "La consulta no tiene un orden determinista: las páginas "
+                "siguientes pueden repetir u omitir filas. Agrega ORDER BY con "
+                "una columna única (por ejemplo la clave primaria)."
+            )
+            warning = f"{warning} {unordered}" if warning else unordered
+
+        result = {
+            "columns": columns,
+            "rows": rows,
+            "truncated": truncated,
+            "next_cursor": (
+                _encode_cursor(query_str, params, offset + page_size)
+                if truncated
+                else None
+            ),
+            "total_estimate": total_estimate,
+        }
+
+        if warning:
+            result["warning"] = warning
+
+        if use_cache:
+            # Las tablas leídas salen del plan; una escritura en cualquiera de
+            # ellas a través del servidor invalida la entrada
+            self.result_cache.set(cache_key, result, _plan_relations(plan))
+
+        return result
+
+    async def execute_non_query(
+        self, query: Union[str, sql.Composable], params: Optional[QueryParams] = None
+    ) -> Dict[str, Any]:
+        if isinstance(query, str):
+            query = _normalize_sql(query)
 
-                return {"success": True, "message": "Consulta ejecutada correctamente"}
+        try:
+            # Al salir del bloque el pool hace commit, o rollback si hubo excepción
+            async with self.pool.connection() as conn:
+                await self.set_statement_timeout(conn, DB_WRITE_TIMEOUT_MS)
+                await conn.execute(query, params)
+
+            return {"success": True, "message": "Consulta ejecutada correctamente"}
 
         except Exception as e:
-            self.conn.rollback()
             return {"success": False, "error": str(e)}
 
-    def list_tables(self) -> List[str]:
+    async def list_tables(self) -> List[str]:
         query = """
 
         SELECT table_name
@@ -63,42 +705,165 @@ class Database:
         ORDER BY table_name
         """
 
-        result = self.execute_query(query_str=str(query))
+        cached = self.schema_cache.get("tables")
+        if cached is not None:
+            return cached
+
+        result = await self.fetch_all(query_str=str(query))
+        tables = [row["table_name"] for row in result["rows"]]
 
-        return [row["table_name"] for row in result["rows"]]
+        self.schema_cache.set("tables", tables)
+
+        return tables
 
-    def get_table_info(self, table_name: str) -> List[Dict[str, Any]]:
-        query = f"""
+    async def get_table_info(self, table_name: str) -> List[Dict[str, Any]]:
+        query = """
         SELECT column_name, data_type, is_nullable, column_default
         FROM information_schema.columns
 
 
-        WHERE table_name = '{table_name}'
+        WHERE table_name = %(table_name)s
         """
 
-        return self.execute_query(query)
+        cache_key = f"table:{table_name}"
+        cached = self.schema_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        result = await self.fetch_all(query, {"table_name": table_name})
+
+        if "error" not in result:
+            self.schema_cache.set(cache_key, result)
+
+        return result
+
+    async def describe_schema(
+        self, tables: Optional[List[str]] = None
+    ) -> List[Dict[str, Any]]:
+        cache_key = "describe:" + (",".join(sorted(tables)) if tables else "*")
+        cached = self.schema_cache.get(cache_key)
+        if cached is not None:
+            return cached
 
-    def create_table(self, table_name: str, columns: str) -> Dict[str, Any]:
-        query = f"CREATE TABLE {table_name} ({columns})"
+        result = await self.fetch_all(DESCRIBE_SCHEMA_SQL, {"tables": tables or None})
+        self.schema_cache.set(cache_key, result["rows"])
 
-        return self.execute_non_query(query)
+        return result["rows"]
 
-    def insert_record(
-        self, table_name: str, columns: str, values: str
+    async def create_table(self, table_name: str, columns: str) -> Dict[str, Any]:
+        # Las definiciones de columnas son DDL y no admiten parámetros
+        query = sql.SQL("CREATE TABLE {} ({})").format(
+            _table_identifier(table_name), sql.SQL(columns)
+        )
+
+        result = await self.execute_non_query(query)
+
+        if result["success"]:
+            self.schema_cache.invalidate()
+            self.result_cache.invalidate_table(table_name)
+
+        return result
+
+    async def insert_records(
+        self,
+        table_name: str,
+        records: List[Dict[str, Any]],
+        batch_size: int = DB_INSERT_BATCH_SIZE,
     ) -> Dict[str, Any]:
-        query = f"INSERT INTO {table_name} ({columns}) VALUES ({values})"
+        # Columnas en orden de aparición; las claves ausentes en una fila van como NULL
+        columns = list(dict.fromkeys(key for record in records for key in record))
+
+        copy_stmt = sql.SQL("COPY {} ({}) FROM STDIN").format(
+            _table_identifier(table_name),
+            sql.SQL(", ").join(sql.Identifier(column) for column in columns),
+        )
+
+        inserted = 0
+        errors = []
+
+        # Una sola transacción con COPY por lote. Cada lote corre en un SAVEPOINT
+        # (transacción anidada), así un lote con error se revierte solo y el
+        # resto se confirma en un único commit al final.
+        async with self.pool.connection() as conn:
+            await self.set_statement_timeout(conn, DB_BULK_TIMEOUT_MS)
+
+            async with conn.transaction():
+                for batch_number, start in enumerate(
+                    range(0, len(records), batch_size), start=1
+                ):
+                    batch = records[start : start + batch_size]
+
+                    try:
+                        async with conn.transaction():
+                            async with conn.cursor() as cur:
+                                async with cur.copy(copy_stmt) as copy:
+                                    for record in batch:
+                                        await copy.write_row(
+                                            [record.get(column) for column in columns]
+                                        )
+
+                        inserted += len(batch)
+
+                    except Exception as e:
+                        errors.append(
+                            {
+                                "batch": batch_number,
+                                "rows": [start, start + len(batch) - 1],
+                                "error": str(e),
+                            }
+                        )
+
+        if inserted:
+            self.result_cache.invalidate_table(table_name)
+
+        return {
+            "success": not errors,
+            "inserted": inserted,
+            "failed": len(records) - inserted,
+            "batches": -(-len(records) // batch_size),
+            "errors": errors,
+        }
+
+    async def insert_record(
+        self, table_name: str, record: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        query = sql.SQL("INSERT INTO {} ({}) VALUES ({})").format(
+            _table_identifier(table_name),
+            sql.SQL(", ").join(sql.Identifier(column) for column in record),
+            sql.SQL(", ").join(sql.Placeholder() for _ in record),
+        )
+
+        result = await self.execute_non_query(query, list(record.values()))
+
+        if result["success"]:
+            self.result_cache.invalidate_table(table_name)
+
+        return result
+
+    async def delete_record(
+        self, table_name: str, condition: str, params: Optional[QueryParams] = None
+    ) -> Dict[str, Any]:
+        query = sql.SQL("DELETE FROM {} WHERE {}").format(
+            _table_identifier(table_name), sql.SQL(_normalize_sql(condition))
+        )
+
+        result = await self.execute_non_query(query, params)
+
+        if result["success"]:
+            self.result_cache.invalidate_table(table_name)
 
-        return self.execute_non_query(query)
+        return result
 
-    def delete_record(self, table_name: str, condition: str) -> Dict[str, Any]:
-        query = f"DELETE FROM {table_name} WHERE {condition}"
+    async def drop_table(self, table_name: str) -> Dict[str, Any]:
+        query = sql.SQL("DROP TABLE IF EXISTS {}").format(_table_identifier(table_name))
 
-        return self.execute_non_query(query)
+        result = await self.execute_non_query(query)
 
-    def drop_table(self, table_name: str) -> Dict[str, Any]:
-        query = f"DROP TABLE IF EXISTS {table_name}"
+        if result["success"]:
+            self.schema_cache.invalidate()
+            self.result_cache.invalidate_table(table_name)
 
-        return self.execute_non_query(query)
+        return result
 
 
 @dataclass
@@ -136,7 +901,7 @@ async def list_tables(ctx: Context) -> List[str]:
     try:
         context_app: AppContext = ctx.request_context.lifespan_context
 
-        tables = context_app.db.list_tables()
+        tables = await context_app.db.list_tables()
 
         if not tables:
             return ["No hay tablas en la base de datos."]
@@ -144,34 +909,69 @@ async def list_tables(ctx: Context) -> List[str]:
         return tables
 
     except Exception as e:
-        print(f"❌ Error al listar tablas: {e}")
+        logger.error("Error al listar tablas: %s", e)
         return [f"Error: {str(e)}"]
 
 
 @mcp.tool(name="execute_query", description="Ejecuta una consulta SELECT a PostgreSQL")
-async def execute_query(query: str, ctx: Context) -> dict:
+async def execute_query(
+    query: str,
+    ctx: Context,
+    params: Optional[List[Any]] = None,
+    page_size: int = DB_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    use_cache: bool = False,
+    output_format: str = "objects",
+) -> dict:
     """
     Ejecuta una consulta SELECT en la base de datos PostgreSQL.
 
 
     Esta función permite ejecutar consultas de lectura (SELECT) de forma segura,
-    limitando los resultados a 50 filas para evitar sobrecarga de memoria.
+    paginando los resultados. El límite de filas se aplica en la base de datos,
+    por lo que la memoria del servidor no crece con el tamaño de la tabla.
 
 
     Args:
         query (str): Consulta SQL SELECT a ejecutar. Debe comenzar con 'SELECT'
-                    (no distingue mayúsculas/minúsculas).
+                    (no distingue mayúsculas/minúsculas). Los valores variables
+                    se escriben como %s y se pasan en 'params'.
+                    Ejemplo: "SELECT * FROM usuarios WHERE edad > %s"
+        params (List[Any], opcional): Valores para los %s de la consulta, en orden.
+                    Con parámetros, un '%' literal se escribe '%%'.
+        page_size (int): Filas por página (por defecto 50, máximo DB_MAX_PAGE_SIZE).
+        cursor (str, opcional): Valor de 'next_cursor' de la respuesta anterior
+                    para obtener la página siguiente de la misma consulta.
+                    El cursor es un OFFSET: para que las páginas no repitan ni
+                    omitan filas la consulta necesita un ORDER BY determinista
+                    (por ejemplo por la clave primaria).
+        use_cache (bool): Si es True, reutiliza el resultado de una ejecución
+                    reciente idéntica (misma consulta, parámetros y página).
+                    Se invalida al escribir en las tablas consultadas.
+        output_format (str): Formato de las filas:
+                    - 'objects' (por defecto): lista de diccionarios por fila
+                    - 'columnar': nombres de columna una vez y filas como listas
+                    - 'csv' / 'tsv': texto con encabezado en la clave 'csv'/'tsv'
+                    Decimales, fechas y bytea se devuelven como texto.
 
     Returns:
         dict: Diccionario con la estructura:
               - 'columns': Lista con los nombres de las columnas
-              - 'rows': Lista de diccionarios, cada uno representa una fila
+              - 'rows': Filas en el formato indicado por 'output_format'
+              - 'truncated': True si hay más filas después de esta página
+              - 'next_cursor': Cursor para pedir la página siguiente (o None)
+              - 'total_estimate': Estimación de filas totales según el planificador
+              - 'cached': True si el resultado proviene de la caché
+              - 'warning': Aviso si EXPLAIN estima una consulta costosa o si
+                           se pagina una consulta sin orden definido
               - 'error': Mensaje de error si ocurre algún problema
 
 
     Raises:
         Retorna un diccionario con 'error' si:
         - La consulta no es un SELECT
+        - EXPLAIN estima un costo o número de filas sobre el límite configurado
+        - La consulta supera el statement_timeout o el cliente la cancela
         - Ocurre un error durante la ejecución
 
     """
@@ -181,7 +981,37 @@ async def execute_query(query: str, ctx: Context) -> dict:
         if not query.strip().lower().startswith("select"):
             return {"error": "Solo se permiten consultas SELECT por seguridad."}
 
-        return context_app.db.execute_query(query)
+        result = await context_app.db.execute_query(
+            query, params, page_size, cursor, use_cache
+        )
+
+        return _format_result(result, output_format)
+
+    except Exception as e:
+        return {"error": str(e)}
+
+
+@mcp.tool(
+    name="get_cache_stats",
+    description="Estadísticas de la caché de resultados de execute_query",
+)
+async def get_cache_stats(ctx: Context) -> Dict[str, Any]:
+    """
+    Obtiene las estadísticas de la caché de resultados de consultas.
+
+    Returns:
+        Dict[str, Any]: Diccionario con:
+                       - 'entries': Número de resultados en caché
+                       - 'bytes': Tamaño aproximado ocupado
+                       - 'hits' / 'misses': Aciertos y fallos de la caché
+                       - 'hit_ratio': Proporción de aciertos
+                       - 'evictions': Entradas expulsadas por límite de memoria (LRU)
+                       - 'invalidations': Entradas invalidadas por escrituras
+    """
+    try:
+        context_app: AppContext = ctx.request_context.lifespan_context
+
+        return context_app.db.result_cache.stats()
 
     except Exception as e:
         return {"error": str(e)}
@@ -213,12 +1043,52 @@ async def get_table_info(table_name: str, ctx: Context) -> List[Dict[str, Any]]:
     try:
         context_app: AppContext = ctx.request_context.lifespan_context
 
-        return context_app.db.get_table_info(table_name)
+        return await context_app.db.get_table_info(table_name)
 
     except Exception as e:
         return [{"error": f"Error obteniendo información de tabla: {str(e)}"}]
 
 
+@mcp.tool(
+    name="describe_schema",
+    description="Describir en una sola llamada todas las tablas, columnas, claves e índices",
+)
+async def describe_schema(
+    ctx: Context, tables: Optional[List[str]] = None
+) -> Dict[str, Any]:
+    """
+    Obtiene la estructura completa del esquema 'public' con una sola consulta.
+
+    Reemplaza la secuencia list_tables + get_table_info por cada tabla: en un
+    único round-trip al catálogo de PostgreSQL devuelve, por tabla, sus columnas,
+    clave primaria, claves foráneas, índices y una estimación de filas.
+
+    Args:
+        tables (List[str], opcional): Nombres de las tablas a describir.
+                                      Si se omite, se describen todas.
+
+    Returns:
+        Dict[str, Any]: Diccionario con la clave 'tables', una lista donde cada
+                       elemento contiene:
+                       - 'table_name': Nombre de la tabla
+                       - 'estimated_rows': Filas estimadas según las estadísticas
+                       - 'columns': Columnas con 'column_name', 'data_type',
+                         'is_nullable' y 'column_default'
+                       - 'primary_key': Columnas de la clave primaria
+                       - 'foreign_keys': Claves foráneas con 'name', 'references'
+                         y 'definition'
+                       - 'indexes': Índices con 'name' y 'definition'
+                       En caso de error, retorna un diccionario con 'error'.
+    """
+    try:
+        context_app: AppContext = ctx.request_context.lifespan_context
+
+        return {"tables": await context_app.db.describe_schema(tables)}
+
+    except Exception as e:
+        return {"error": f"Error describiendo el esquema: {str(e)}"}
+
+
 @mcp.tool(
     name="create_table",
     description="Crear una nueva tabla en la base de datos",
@@ -254,7 +1124,7 @@ async def create_table(table_name: str, columns: str, ctx: Context) -> Dict[str,
     try:
         context_app: AppContext = ctx.request_context.lifespan_context
 
-        result = context_app.db.create_table(table_name, columns)
+        result = await context_app.db.create_table(table_name, columns)
 
         if result["success"]:
             return {
@@ -272,22 +1142,20 @@ async def create_table(table_name: str, columns: str, ctx: Context) -> Dict[str,
     description="Insertar un registro en una tabla",
 )
 async def insert_record(
-    table_name: str, columns: str, values: str, ctx: Context
+    table_name: str, record: Dict[str, Any], ctx: Context
 ) -> Dict[str, Any]:
     """
     Inserta un nuevo registro en una tabla existente de la base de datos.
 
-    Esta función ejecuta una sentencia INSERT INTO con los valores especificados.
-    La operación se realiza dentro de una transacción que se revierte automáticamente
-    en caso de error, manteniendo la integridad de los datos.
+    Esta función ejecuta una sentencia INSERT INTO con los valores especificados
+    como parámetros, separados del texto SQL. La operación se realiza dentro de
+    una transacción que se revierte automáticamente en caso de error,
+    manteniendo la integridad de los datos.
 
     Args:
         table_name (str): Nombre de la tabla donde insertar el registro.
-        columns (str): Nombres de las columnas separadas por comas.
-                      Ejemplo: "nombre, edad, email"
-        values (str): Valores a insertar en el mismo orden que las columnas.
-                     Los strings deben estar entre comillas simples.
-                     Ejemplo: "'Nombre', 30, 'nombre@email.com'"
+        record (Dict[str, Any]): Valores a insertar, como columna -> valor.
+                     Ejemplo: {"nombre": "Nombre", "edad": 30, "email": "nombre@email.com"}
 
     Returns:
         Dict[str, Any]: Diccionario con el resultado de la operación:
@@ -299,12 +1167,16 @@ async def insert_record(
         - La tabla debe existir previamente
         - Los tipos de datos deben coincidir con la definición de la tabla
         - Las restricciones de la tabla (NOT NULL, UNIQUE, etc.) se aplicarán
-        - Los valores de texto deben estar entre comillas simples
-        - Para valores nulos, usar la palabra NULL sin comillas
+        - Los valores se envían tal cual, sin comillas ni escapes
+        - Para valores nulos, usar null
     """
     try:
         context_app: AppContext = ctx.request_context.lifespan_context
-        result = context_app.db.insert_record(table_name, columns, values)
+
+        if not record:
+            return {"success": False, "error": "El registro no tiene columnas"}
+
+        result = await context_app.db.insert_record(table_name, record)
 
         if result["success"]:
             return {
@@ -318,11 +1190,75 @@ async def insert_record(
         return {"success": False, "error": f"Error insertando registro: {str(e)}"}
 
 
+@mcp.tool(
+    name="insert_records",
+    description="Insertar muchos registros en una tabla en una sola operación (COPY)",
+)
+async def insert_records(
+    table_name: str,
+    ctx: Context,
+    records: Optional[List[Dict[str, Any]]] = None,
+    content: Optional[str] = None,
+    content_format: str = "csv",
+    batch_size: int = DB_INSERT_BATCH_SIZE,
+) -> Dict[str, Any]:
+    """
+    Inserta registros de forma masiva en una tabla existente.
+
+    Los datos se cargan con COPY FROM STDIN dentro de una única transacción,
+    dividida en lotes. Si un lote falla, solo ese lote se revierte y el error
+    se informa; los demás lotes se confirman.
+
+    Args:
+        table_name (str): Nombre de la tabla donde insertar los registros.
+        records (List[Dict[str, Any]], opcional): Filas como diccionarios
+                      columna -> valor. Ejemplo: [{"nombre": "Ana", "edad": 30}]
+        content (str, opcional): Alternativa a 'records': datos en texto CSV
+                      (con encabezado) o JSON lines (un objeto por línea).
+        content_format (str): Formato de 'content': 'csv' o 'jsonl'.
+        batch_size (int): Filas por lote (por defecto DB_INSERT_BATCH_SIZE).
+
+    Returns:
+        Dict[str, Any]: Diccionario con el resultado de la operación:
+                       - 'success': True si todos los lotes se insertaron
+                       - 'inserted': Número de filas insertadas
+                       - 'failed': Número de filas no insertadas
+                       - 'batches': Número de lotes procesados
+                       - 'errors': Lista con 'batch', 'rows' (rango de índices)
+                         y 'error' de cada lote fallido
+
+    Note:
+        - La tabla debe existir previamente
+        - Las columnas que falten en una fila se insertan como NULL
+        - Los valores se convierten al tipo de cada columna por PostgreSQL
+    """
+    try:
+        context_app: AppContext = ctx.request_context.lifespan_context
+
+        if records is None:
+            if content is None:
+                return {"success": False, "error": "Debe indicar 'records' o 'content'"}
+
+            records = _parse_records(content, content_format)
+
+        if not records:
+            return {"success": False, "error": "No hay registros para insertar"}
+
+        return await context_app.db.insert_records(
+            table_name, records, max(1, batch_size)
+        )
+
+    except Exception as e:
+        return {"success": False, "error": f"Error insertando registros: {str(e)}"}
+
+
 @mcp.tool(
     name="delete_record",
     description="Eliminar un registro de una tabla",
 )
-async def delete_record(table_name: str, condition: str, ctx: Context):
+async def delete_record(
+    table_name: str, condition: str, ctx: Context, params: Optional[List[Any]] = None
+):
     """Elimina un registro de una tabla existente en la base de datos.
 
     Esta función ejecuta una sentencia DELETE con la condición especificada.
@@ -332,7 +1268,10 @@ async def delete_record(table_name: str, condition: str, ctx: Context):
     Args:
         table_name (str): Nombre de la tabla de donde eliminar el registro.
         condition (str): Condición para identificar el registro a eliminar.
-                        Ejemplo: "id = 1" o "email = 'test@email.com'"
+                        Los valores se escriben como %s y se pasan en 'params'.
+                        Ejemplo: "id = %s" o "email = %s"
+        params (List[Any], opcional): Valores para los %s de la condición, en orden.
+                        Ejemplo: [1] o ["test@email.com"]
 
     Returns:
         Dict[str, Any]: Diccionario con el resultado de la operación:
@@ -347,7 +1286,7 @@ async def delete_record(table_name: str, condition: str, ctx: Context):
     """
     try:
         context_app: AppContext = ctx.request_context.lifespan_context
-        result = context_app.db.delete_record(table_name, condition)
+        result = await context_app.db.delete_record(table_name, condition, params)
 
         if result["success"]:
             return {
@@ -387,7 +1326,7 @@ async def drop_table(table_name: str, ctx: Context) -> Dict[str, Any]:
     """
     try:
         context_app: AppContext = ctx.request_context.lifespan_context
-        return context_app.db.drop_table(table_name)
+        return await context_app.db.drop_table(table_name)
 
     except Exception as e:
         return {"success": False, "error": f"Error eliminando tabla: {str(e)}"}
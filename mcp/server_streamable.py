@@ -1,14 +1,16 @@
-import os
+from typing import Optional
 
-import httpx
+import uvicorn
 from dotenv import load_dotenv
 
-from mcp.server.fastmcp import FastMCP
+from mcp.server.fastmcp import Context, FastMCP
+
+from weather_client import WeatherClient, weather_lifespan, with_weather_client
 
 load_dotenv(override=True)
 
 # Aplicaciones conversacionales (chatbots, asistentes) que necesitan memoria entre interacciones
-mcp = FastMCP("stateful server")
+mcp = FastMCP("stateful server", lifespan=weather_lifespan)
 
 # Procesamiento de requests independientes con streaming
 # mcp = FastMCP("StatelessServer", stateless_http=True)
@@ -19,21 +21,53 @@ mcp = FastMCP("stateful server")
 
 @mcp.tool(
     name="fetch_weather",
-    description="Consulta el clima actual de una ciudad usando la API de Visual Crossing.",
+    description=(
+        "Consulta el clima actual de una ciudad usando la API de Visual Crossing. "
+        "Devuelve un resumen compacto; usa fields para pedir otros campos."
+    ),
 )
-async def fetch_weather(city: str) -> dict:
-    WEATHER_API_KEY = os.getenv("WEATHER_API_KEY")
+async def fetch_weather(
+    city: str, ctx: Context, fields: Optional[list[str]] = None
+) -> dict:
+    """
+    Args:
+        city: Nombre de la ciudad.
+        fields: Campos a devolver de las condiciones actuales o del día (temp,
+            humidity, windspeed, conditions, uvindex, sunrise...). Por defecto
+            un resumen compacto; ["*"] devuelve la respuesta completa.
+    """
+    weather: WeatherClient = ctx.request_context.lifespan_context
+
+    return await weather.fetch(city, fields)
 
-    if not WEATHER_API_KEY:
-        return {"error": "WEATHER_API_KEY no está configurada"}
 
-    async with httpx.AsyncClient() as client:
-        resp = await client.get(
-            f"https://weather.visualcrossing.com/VisualCrossingWebServices/rest/services/timeline/{city}/today?unitGroup=metric&include=current&key={WEATHER_API_KEY}&contentType=json"
-        )
+@mcp.tool(
+    name="fetch_weather_many",
+    description=(
+        "Consulta en paralelo el clima actual de varias ciudades en una sola "
+        "llamada. Úsala en lugar de llamar fetch_weather una vez por ciudad."
+    ),
+)
+async def fetch_weather_many(
+    cities: list[str], ctx: Context, fields: Optional[list[str]] = None
+) -> dict:
+    """
+    Args:
+        cities: Nombres de las ciudades.
+        fields: Campos a devolver por ciudad, igual que en fetch_weather.
+    """
+    weather: WeatherClient = ctx.request_context.lifespan_context
 
-    return resp.json()
+    # Resultado por ciudad; las que fallan traen {"error": ...} sin afectar al resto
+    return await weather.fetch_many(cities, fields)
 
 
 if __name__ == "__main__":
-    mcp.run(transport="streamable-http")
+    # Equivale a mcp.run(transport="streamable-http"), cerrando al apagar el
+    # cliente del clima que comparten todas las sesiones
+    uvicorn.run(
+        with_weather_client(mcp.streamable_http_app()),
+        host=mcp.settings.host,
+        port=mcp.settings.port,
+        log_level=mcp.settings.log_level.lower(),
+    )
@@ -1,69 +1,1428 @@
-import torch
+import asyncio
+import json
+import logging
+import math
+import multiprocessing
+import os
+import re
+import sqlite3
+import subprocess
+import tempfile
+import time
+import uuid
+import zlib
+from collections.abc import AsyncIterator, Awaitable, Callable, Iterable, Iterator
+from concurrent.futures import (
+    BrokenExecutor,
+    Executor,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+)
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from importlib.util import find_spec
+from typing import Any, Dict, List, Optional
+
+import numpy as np
 from dotenv import load_dotenv
-from pytubefix import YouTube
 
-import whisper
-from mcp.server.fastmcp import FastMCP
+from mcp.server.fastmcp import Context, FastMCP
+
+# torch, whisper, faster_whisper, pytubefix y youtube_transcript_api se importan
+# dentro de las funciones que los usan: importar torch y whisper tarda varios
+# segundos y el servidor debe responder a initialize y tools/list de inmediato
 
 # from openai import OpenAI
 
 load_dotenv(override=True)
 
+# stdout es el canal JSON-RPC del transporte stdio (y los workers lo heredan):
+# los mensajes van por logging, que FastMCP configura hacia stderr
+logger = logging.getLogger(__name__)
+
+# Tamaño del modelo de Whisper (tiny, base, small, medium, large...) y dispositivo.
+# Si WHISPER_DEVICE no se define se usa cuda cuando está disponible.
+WHISPER_MODEL = os.getenv("WHISPER_MODEL") or "medium"
+WHISPER_DEVICE = os.getenv("WHISPER_DEVICE") or None
+
+# Motor de inferencia: "whisper" (openai-whisper, PyTorch) o "faster-whisper"
+# (CTranslate2, varias veces más rápido en CPU con pesos int8). Con "auto" se
+# usa faster-whisper si está instalado (extra opcional: uv sync --extra fast)
+TRANSCRIBE_BACKEND = os.getenv("TRANSCRIBE_BACKEND") or "auto"
+# Por defecto float16 en GPU e int8 en CPU
+FASTER_WHISPER_COMPUTE_TYPE = os.getenv("FASTER_WHISPER_COMPUTE_TYPE") or None
+
+# Con WHISPER_MODEL=auto el tamaño se elige por video: el modelo más grande
+# que transcribe el audio dentro de TRANSCRIBE_LATENCY_BUDGET segundos según
+# MODEL_RTF. Si no se conoce la duración se usa AUTO_DEFAULT_MODEL
+TRANSCRIBE_LATENCY_BUDGET = float(os.getenv("TRANSCRIBE_LATENCY_BUDGET") or "300")
+AUTO_DEFAULT_MODEL = "small"
+
+MODEL_SIZES = ["tiny", "base", "small", "medium", "large-v3"]
+
+# Factor de tiempo real en CPU (segundos de cómputo por segundo de audio) de
+# cada modelo en un worker; en GPU se divide por GPU_SPEEDUP. Son valores
+# orientativos SIN CALIBRAR: conviene medirlos en la máquina que sirve las
+# transcripciones con bench/transcription.py y ajustar la tabla
+MODEL_RTF = {
+    "whisper": {
+        "tiny": 0.1,
+        "base": 0.2,
+        "small": 0.6,
+        "medium": 1.8,
+        "large-v3": 3.5,
+    },
+    "faster-whisper": {
+        "tiny": 0.03,
+        "base": 0.05,
+        "small": 0.15,
+        "medium": 0.45,
+        "large-v3": 0.9,
+    },
+}
+GPU_SPEEDUP = 10.0
+
+# Con WHISPER_WARMUP=1 el modelo se carga en segundo plano al iniciar el
+# servidor (sin retrasar el handshake) en lugar de hacerlo en la primera
+# transcripción
+WHISPER_WARMUP = (os.getenv("WHISPER_WARMUP") or "0") == "1"
+
+# Idioma del audio (es, en...). Si no se define, Whisper lo detecta
+WHISPER_LANGUAGE = os.getenv("WHISPER_LANGUAGE") or None
+
+# En CPU el audio se divide en segmentos que se transcriben en paralelo en un
+# pool de procesos. Cada proceso carga su propia copia del modelo, así que el
+# número de procesos también está limitado por la memoria disponible.
+TRANSCRIBE_WORKERS = int(
+    os.getenv("TRANSCRIBE_WORKERS") or str(min(os.cpu_count() or 1, 4))
+)
+
+# Duración objetivo de cada segmento; el corte se hace en el punto más
+# silencioso de los últimos SILENCE_SEARCH_SECONDS para no partir palabras, y
+# cada segmento incluye CHUNK_OVERLAP_SECONDS de contexto a cada lado
+CHUNK_SECONDS = float(os.getenv("CHUNK_SECONDS") or "120")
+SILENCE_SEARCH_SECONDS = float(os.getenv("SILENCE_SEARCH_SECONDS") or "10")
+CHUNK_OVERLAP_SECONDS = float(os.getenv("CHUNK_OVERLAP_SECONDS") or "1")
+
+# Idiomas preferidos para los subtítulos de YouTube, en orden de prioridad
+CAPTION_LANGUAGES = [
+    language.strip()
+    for language in (os.getenv("CAPTION_LANGUAGES") or "es,en").split(",")
+    if language.strip()
+]
+
+# Caché persistente de transcripciones por video, modelo e idioma. Al superar
+# TRANSCRIPT_CACHE_MAX_BYTES se eliminan las entradas usadas hace más tiempo
+TRANSCRIPT_CACHE_PATH = os.getenv("TRANSCRIPT_CACHE_PATH") or os.path.join(
+    os.path.expanduser("~"), ".cache", "agent-notes", "transcripts.db"
+)
+TRANSCRIPT_CACHE_MAX_BYTES = int(
+    os.getenv("TRANSCRIPT_CACHE_MAX_BYTES") or str(500 * 1024 * 1024)
+)
+
+# Trabajos de transcripción en segundo plano: cuántos se procesan a la vez (el
+# resto espera en cola) y cuánto tiempo se conservan los terminados
+TRANSCRIBE_MAX_JOBS = int(os.getenv("TRANSCRIBE_MAX_JOBS") or "1")
+JOB_RETENTION_SECONDS = float(os.getenv("JOB_RETENTION_SECONDS") or "3600")
+
+# Frecuencia de muestreo que espera Whisper (whisper.audio.SAMPLE_RATE)
+SAMPLE_RATE = 16000
+
+SegmentsCallback = Callable[[List[Dict[str, Any]]], None]
+
+_VIDEO_ID_RE = re.compile(r"(?:v=|/shorts/|/embed/|/live/|youtu\.be/)([\w-]{11})")
+
+
+def video_id_from_url(url: str) -> str:
+    match = _VIDEO_ID_RE.search(url)
+    if match:
+        return match.group(1)
+
+    if re.fullmatch(r"[\w-]{11}", url):
+        return url
+
+    raise ValueError(f"No se pudo obtener el ID del video de '{url}'")
+
+
+@dataclass
+class TranscriptCache:
+    path: str
+    max_bytes: int
+    conn: sqlite3.Connection = field(init=False)
+
+    def __post_init__(self) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+
+        self.conn = sqlite3.connect(self.path)
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS transcripts (
+                video_id TEXT NOT NULL,
+                model TEXT NOT NULL,
+                language TEXT NOT NULL,
+                data BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (video_id, model, language)
+            )
+            """
+        )
+        self.conn.commit()
+
+    def get(self, video_id: str, model: str, language: str) -> Optional[Dict[str, Any]]:
+        row = self.conn.execute(
+            "SELECT data FROM transcripts WHERE video_id = ? AND model = ? AND language = ?",
+            (video_id, model, language),
+        ).fetchone()
+
+        if row is None:
+            return None
+
+        self.conn.execute(
+            "UPDATE transcripts SET last_access = ? "
+            "WHERE video_id = ? AND model = ? AND language = ?",
+            (time.time(), video_id, model, language),
+        )
+        self.conn.commit()
+
+        return json.loads(zlib.decompress(row[0]))
+
+    def put(
+        self, video_id: str, model: str, language: str, transcript: Dict[str, Any]
+    ) -> None:
+        data = zlib.compress(json.dumps(transcript).encode(), level=9)
+        now = time.time()
+
+        self.conn.execute(
+            "INSERT OR REPLACE INTO transcripts VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (video_id, model, language, data, len(data), now, now),
+        )
+        self._evict()
+        self.conn.commit()
+
+    def _evict(self) -> None:
+        (total,) = self.conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM transcripts"
+        ).fetchone()
+
+        rows = self.conn.execute(
+            "SELECT rowid, size FROM transcripts ORDER BY last_access"
+        ).fetchall()
+
+        for rowid, size in rows:
+            if total <= self.max_bytes:
+                break
+
+            self.conn.execute("DELETE FROM transcripts WHERE rowid = ?", (rowid,))
+            total -= size
+
+    def list_entries(self) -> List[Dict[str, Any]]:
+        rows = self.conn.execute(
+            "SELECT video_id, model, language, size, created_at, last_access "
+            "FROM transcripts ORDER BY last_access DESC"
+        ).fetchall()
+
+        return [
+            {
+                "video_id": video_id,
+                "model": model,
+                "language": language,
+                "size_bytes": size,
+                "created_at": time.strftime(
+                    "%Y-%m-%d %H:%M:%S", time.localtime(created)
+                ),
+                "last_access": time.strftime(
+                    "%Y-%m-%d %H:%M:%S", time.localtime(access)
+                ),
+            }
+            for video_id, model, language, size, created, access in rows
+        ]
+
+    def purge(self, video_id: Optional[str] = None) -> int:
+        if video_id is None:
+            cursor = self.conn.execute("DELETE FROM transcripts")
+        else:
+            cursor = self.conn.execute(
+                "DELETE FROM transcripts WHERE video_id = ?", (video_id,)
+            )
+        self.conn.commit()
+
+        return cursor.rowcount
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+@dataclass
+class AudioChunk:
+    index: int
+    start: float  # inicio del tramo propio del segmento, en segundos
+    end: float  # fin del tramo propio del segmento, en segundos
+    offset: float  # posición del primer sample de 'audio' (incluye solapamiento)
+    audio: np.ndarray
+
+
+def _quietest_point(audio: np.ndarray, start: int, end: int) -> int:
+    # Energía en ventanas de 100 ms; devuelve el centro de la más silenciosa
+    frame = SAMPLE_RATE // 10
+    window = audio[start:end]
+    n_frames = len(window) // frame
+
+    if n_frames == 0:
+        return end
+
+    energy = np.square(window[: n_frames * frame]).reshape(n_frames, frame).mean(axis=1)
+
+    return start + int(np.argmin(energy)) * frame + frame // 2
+
+
+def iter_audio_chunks(blocks: Iterable[np.ndarray]) -> Iterator[AudioChunk]:
+    """
+    Divide audio PCM (float32, 16 kHz) en segmentos solapados cortados en silencio.
+
+    Acepta el audio en bloques para poder emitir segmentos mientras el audio
+    todavía se está decodificando.
+    """
+    chunk = int(CHUNK_SECONDS * SAMPLE_RATE)
+    search = min(int(SILENCE_SEARCH_SECONDS * SAMPLE_RATE), chunk // 2)
+    overlap = int(CHUNK_OVERLAP_SECONDS * SAMPLE_RATE)
+
+    buffer = np.zeros(0, dtype=np.float32)
+    buffer_start = 0  # posición absoluta (en samples) de buffer[0]
+    own_start = 0
+    index = 0
+
+    def make_chunk(own_end: int, audio_end: int) -> AudioChunk:
+        audio_start = max(own_start - overlap, buffer_start)
+
+        return AudioChunk(
+            index=index,
+            start=own_start / SAMPLE_RATE,
+            end=own_end / SAMPLE_RATE,
+            offset=audio_start / SAMPLE_RATE,
+            audio=buffer[audio_start - buffer_start : audio_end - buffer_start].copy(),
+        )
+
+    for block in blocks:
+        buffer = np.concatenate([buffer, block.astype(np.float32, copy=False)])
+        buffer_end = buffer_start + len(buffer)
+
+        while buffer_end - own_start >= chunk + overlap:
+            cut = _quietest_point(
+                buffer,
+                own_start + chunk - search - buffer_start,
+                own_start + chunk - buffer_start,
+            )
+            cut += buffer_start
+
+            yield make_chunk(cut, min(cut + overlap, buffer_end))
+            index += 1
+            own_start = cut
+
+            keep_from = max(own_start - overlap, buffer_start)
+            buffer = buffer[keep_from - buffer_start :]
+            buffer_start = keep_from
+
+    buffer_end = buffer_start + len(buffer)
+    if buffer_end > own_start:
+        # Último segmento: el fin se marca como infinito para no descartar un
+        # segmento de Whisper que termine justo en el borde
+        last = make_chunk(buffer_end, buffer_end)
+        last.end = float("inf")
+        yield last
+
+
+class AudioDecodeError(Exception):
+    """ffmpeg no pudo leer o decodificar el stream de audio."""
+
+
+class AudioStream:
+    """
+    Decodifica con ffmpeg el audio de un video de YouTube directamente desde la
+    URL del stream a PCM 16 kHz, sin archivo intermedio. Los bloques se
+    obtienen mientras la descarga avanza.
+    """
+
+    BLOCK_SECONDS = 10
+
+    def __init__(self, url: str) -> None:
+        from pytubefix import YouTube
+
+        yt = YouTube(url)
+        stream_url = yt.streams.get_audio_only().url
+
+        self.duration = float(yt.length)
+        self.samples = 0
+        # stderr va a un archivo temporal y no a un pipe: si ffmpeg escribe más
+        # de lo que cabe en el buffer del pipe mientras se lee stdout, ambos
+        # procesos quedarían esperándose
+        self.stderr = tempfile.TemporaryFile()
+        self.process = subprocess.Popen(
+            [
+                "ffmpeg",
+                "-nostdin",
+                "-loglevel",
+                "error",
+                "-i",
+                stream_url,
+                "-f",
+                "s16le",
+                "-ac",
+                "1",
+                "-ar",
+                str(SAMPLE_RATE),
+                "-",
+            ],
+            stdout=subprocess.PIPE,
+            stderr=self.stderr,
+        )
+
+    def __iter__(self) -> Iterator[np.ndarray]:
+        block_bytes = self.BLOCK_SECONDS * SAMPLE_RATE * 2
+
+        while data := self.process.stdout.read(block_bytes):
+            data = data[: len(data) // 2 * 2]
+            self.samples += len(data) // 2
+
+            yield np.frombuffer(data, np.int16).astype(np.float32) / 32768.0
+
+        if self.process.wait() != 0:
+            self.stderr.seek(0)
+            error = self.stderr.read().decode(errors="replace").strip()
+            raise AudioDecodeError(f"ffmpeg no pudo decodificar el audio: {error}")
+
+    def close(self) -> None:
+        if self.process.poll() is None:
+            self.process.kill()
+        self.process.wait()
+        self.stderr.close()
+
+
+async def iterate_in_thread(iterator: Iterator[Any]) -> AsyncIterator[Any]:
+    # Consume un iterador bloqueante (descarga, ffmpeg) sin bloquear el event loop
+    done = object()
+
+    while (item := await asyncio.to_thread(next, iterator, done)) is not done:
+        yield item
+
+
+class WhisperBackend:
+    """openai-whisper sobre PyTorch (fp16 en GPU, fp32 en CPU)."""
+
+    name = "whisper"
+
+    @staticmethod
+    def load(model_name: str, device: str, threads: Optional[int]) -> Any:
+        import torch
+        import whisper
+
+        # Repartir los núcleos entre procesos evita que compitan por los mismos hilos
+        if threads is not None:
+            torch.set_num_threads(threads)
+
+        return whisper.load_model(model_name, device=device)
+
+    @staticmethod
+    def detect_language(model: Any, audio: np.ndarray) -> str:
+        import whisper
+
+        mel = whisper.log_mel_spectrogram(
+            whisper.pad_or_trim(audio), n_mels=model.dims.n_mels
+        ).to(model.device)
+        _, probs = model.detect_language(mel)
+
+        return max(probs, key=probs.get)
+
+    @staticmethod
+    def transcribe(
+        model: Any, audio: np.ndarray, language: Optional[str]
+    ) -> List[Dict[str, Any]]:
+        result = model.transcribe(
+            audio, language=language, fp16=model.device.type == "cuda"
+        )
+
+        return result["segments"]
+
+
+class FasterWhisperBackend:
+    """faster-whisper (CTranslate2) con pesos cuantizados a int8 en CPU."""
+
+    name = "faster-whisper"
+
+    @staticmethod
+    def load(model_name: str, device: str, threads: Optional[int]) -> Any:
+        import faster_whisper
+
+        return faster_whisper.WhisperModel(
+            model_name,
+            device=device,
+            compute_type=FASTER_WHISPER_COMPUTE_TYPE
+            or ("float16" if device == "cuda" else "int8"),
+            cpu_threads=threads or 0,
+        )
+
+    @staticmethod
+    def detect_language(model: Any, audio: np.ndarray) -> str:
+        # transcribe devuelve un generador perezoso: el idioma ya está en info
+        # sin decodificar ningún segmento
+        _, info = model.transcribe(audio[: 30 * SAMPLE_RATE])
+
+        return info.language
+
+    @staticmethod
+    def transcribe(
+        model: Any, audio: np.ndarray, language: Optional[str]
+    ) -> List[Dict[str, Any]]:
+        segments, _ = model.transcribe(audio, language=language, beam_size=5)
+
+        return [
+            {"start": segment.start, "end": segment.end, "text": segment.text}
+            for segment in segments
+        ]
+
+
+BACKENDS = {backend.name: backend for backend in (WhisperBackend, FasterWhisperBackend)}
+
+
+def resolve_backend(name: str) -> str:
+    # find_spec comprueba si el paquete está instalado sin importarlo
+    installed = find_spec("faster_whisper") is not None
+
+    if name == "auto":
+        return FasterWhisperBackend.name if installed else WhisperBackend.name
+
+    if name not in BACKENDS:
+        raise ValueError(
+            f"Backend no soportado: '{name}' (usa auto, whisper o faster-whisper)"
+        )
+
+    if name == FasterWhisperBackend.name and not installed:
+        raise ValueError("TRANSCRIBE_BACKEND=faster-whisper requiere faster-whisper")
+
+    return name
+
+
+def model_key(backend: str, model_name: str) -> str:
+    # Clave del modelo en la caché de transcripciones; openai-whisper conserva
+    # el nombre a secas para reutilizar las entradas ya guardadas
+    if backend == WhisperBackend.name:
+        return model_name
+
+    return f"{backend}/{model_name}"
+
+
+def select_model(
+    backend: str, device: str, workers: int, duration: Optional[float]
+) -> str:
+    if WHISPER_MODEL != "auto":
+        return WHISPER_MODEL
+
+    if duration is None:
+        return AUTO_DEFAULT_MODEL
+
+    # Los segmentos se transcriben en paralelo, así que el tiempo estimado se
+    # reparte entre los workers que realmente tendrán trabajo
+    parallel = max(1, min(workers, math.ceil(duration / CHUNK_SECONDS)))
+    speedup = GPU_SPEEDUP if device == "cuda" else 1.0
+
+    # El modelo más grande cuyo tiempo estimado entra en el presupuesto
+    for model_name in reversed(MODEL_SIZES):
+        rtf = MODEL_RTF[backend][model_name] / speedup
+        if duration * rtf / parallel <= TRANSCRIBE_LATENCY_BUDGET:
+            return model_name
+
+    return MODEL_SIZES[0]
+
+
+def candidate_models(backend: str) -> List[str]:
+    # Modelos cuya transcripción sirve desde la caché, del más preciso al menos
+    if WHISPER_MODEL != "auto":
+        return [model_key(backend, WHISPER_MODEL)]
+
+    return [model_key(backend, model_name) for model_name in reversed(MODEL_SIZES)]
+
+
+# Estado de cada worker del pool: el modelo se carga una vez por worker y solo
+# se reemplaza cuando una petición pide otro tamaño
+_worker_backend: Any = WhisperBackend
+_worker_device: str = "cpu"
+_worker_threads: Optional[int] = None
+_worker_model_name: Optional[str] = None
+_worker_model: Optional[Any] = None
+
+
+def _init_worker(
+    backend: str, model_name: str, device: str, threads: Optional[int]
+) -> None:
+    global _worker_backend, _worker_device, _worker_threads
+
+    _worker_backend = BACKENDS[backend]
+    _worker_device = device
+    _worker_threads = threads
+
+    _load_model(model_name)
+
+
+def _load_model(model_name: str) -> Any:
+    global _worker_model, _worker_model_name
+
+    if _worker_model_name != model_name:
+        # Se libera el modelo anterior antes de cargar el nuevo
+        _worker_model = None
+
+        logger.info(
+            "Loading %s '%s' on device: %s",
+            _worker_backend.name,
+            model_name,
+            _worker_device,
+        )
+        _worker_model = _worker_backend.load(
+            model_name, _worker_device, _worker_threads
+        )
+        _worker_model_name = model_name
+
+    return _worker_model
+
+
+def _warm_worker() -> None:
+    return None
+
+
+def _detect_language(audio: np.ndarray, model_name: str) -> str:
+    return _worker_backend.detect_language(_load_model(model_name), audio)
+
+
+def _transcribe_chunk(
+    chunk: AudioChunk, language: Optional[str], model_name: str
+) -> List[Dict[str, Any]]:
+    model = _load_model(model_name)
+
+    segments = []
+    for segment in _worker_backend.transcribe(model, chunk.audio, language):
+        start = segment["start"] + chunk.offset
+        end = segment["end"] + chunk.offset
+
+        # Por el solapamiento un mismo tramo aparece en dos segmentos: cada
+        # segmento de Whisper se queda solo en el segmento de audio que
+        # contiene su punto medio
+        if chunk.start <= (start + end) / 2 < chunk.end:
+            segments.append(
+                {
+                    "start": round(start, 2),
+                    "end": round(end, 2),
+                    "text": segment["text"].strip(),
+                }
+            )
+
+    return segments
+
+
+@dataclass
+class Transcriber:
+    model_name: str
+    device: str
+    workers: int = 1
+    backend: str = "auto"
+    executor: Executor = field(init=False)
+
+    def __post_init__(self) -> None:
+        self.backend = resolve_backend(self.backend)
+
+        if self.device == "cpu" and self.workers > 1:
+            # spawn: torch no es seguro tras fork
+            self.executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(
+                    self.backend,
+                    self.model_name,
+                    self.device,
+                    max(1, (os.cpu_count() or 1) // self.workers),
+                ),
+            )
+        else:
+            # Un único hilo con el modelo residente (~1.5 GB en "medium"): en GPU
+            # las inferencias se serializan en lugar de competir por la memoria
+            self.workers = 1
+            self.executor = ThreadPoolExecutor(
+                max_workers=1,
+                initializer=_init_worker,
+                initargs=(self.backend, self.model_name, self.device, None),
+            )
+
+    async def warmup(self) -> None:
+        # Cada worker carga el modelo en su initializer al arrancar
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(
+            *(
+                loop.run_in_executor(self.executor, _warm_worker)
+                for _ in range(self.workers)
+            )
+        )
+
+    def close(self, wait: bool = False) -> None:
+        # Por defecto no espera a que terminen los workers: se llama desde el
+        # event loop y una transcripción en curso lo bloquearía
+        self.executor.shutdown(wait=wait, cancel_futures=True)
+
+    def select_model(self, duration: Optional[float]) -> str:
+        return select_model(self.backend, self.device, self.workers, duration)
+
+    async def transcribe_file(
+        self,
+        path: str,
+        model_name: str,
+        on_segments: Optional[SegmentsCallback] = None,
+    ) -> Dict[str, Any]:
+        from whisper.audio import load_audio
+
+        audio = await asyncio.to_thread(load_audio, path)
+
+        return await self.transcribe_chunks(
+            iterate_in_thread(iter_audio_chunks([audio])), model_name, on_segments
+        )
+
+    async def transcribe_stream(
+        self,
+        stream: AudioStream,
+        model_name: str,
+        on_segments: Optional[SegmentsCallback] = None,
+    ) -> Dict[str, Any]:
+        # Los segmentos se envían a transcribir a medida que ffmpeg los
+        # decodifica, así la descarga se solapa con la inferencia
+        try:
+            return await self.transcribe_chunks(
+                iterate_in_thread(iter_audio_chunks(stream)), model_name, on_segments
+            )
+        finally:
+            stream.close()
+
+    async def transcribe_chunks(
+        self,
+        chunks: AsyncIterator[AudioChunk],
+        model_name: str,
+        on_segments: Optional[SegmentsCallback] = None,
+    ) -> Dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        language = WHISPER_LANGUAGE
+        futures = []
+        emitted = 0
+
+        def emit_ready(_: asyncio.Future) -> None:
+            nonlocal emitted
+
+            # Los workers pueden terminar desordenados; los segmentos parciales
+            # se publican siempre en orden
+            while (
+                emitted < len(futures)
+                and futures[emitted].done()
+                and not futures[emitted].cancelled()
+                and futures[emitted].exception() is None
+            ):
+                on_segments(futures[emitted].result())
+                emitted += 1
 
-mcp = FastMCP("server weather")
+        try:
+            async for chunk in chunks:
+                # El idioma se detecta una vez con el primer segmento para que
+                # todos los segmentos se transcriban de forma consistente
+                if language is None:
+                    language = await loop.run_in_executor(
+                        self.executor, _detect_language, chunk.audio, model_name
+                    )
 
+                future = loop.run_in_executor(
+                    self.executor, _transcribe_chunk, chunk, language, model_name
+                )
+                futures.append(future)
+
+                if on_segments is not None:
+                    future.add_done_callback(emit_ready)
+
+            # gather conserva el orden de los segmentos
+            results = await asyncio.gather(*futures)
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+
+        segments = [segment for result in results for segment in result]
+
+        return {
+            "text": " ".join(segment["text"] for segment in segments),
+            "language": language,
+            "model": model_key(self.backend, model_name),
+            "segments": segments,
+        }
+
+
+@dataclass
+class TranscriptionJob:
+    id: str
+    url: str
+    method: str
+    status: str = "queued"  # queued, running, done, error
+    duration: Optional[float] = None
+    segments: List[Dict[str, Any]] = field(default_factory=list)
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    finished_at: Optional[float] = None
+    changed: asyncio.Event = field(default_factory=asyncio.Event)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "error")
+
+    def notify(self) -> None:
+        # Despierta a quienes esperan cambios; cada cambio usa un evento nuevo
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+    def add_segments(self, segments: List[Dict[str, Any]]) -> None:
+        self.segments.extend(segments)
+        self.notify()
+
+    def status_dict(self) -> Dict[str, Any]:
+        transcribed = self.segments[-1]["end"] if self.segments else 0.0
+
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "transcribed_seconds": transcribed,
+            "duration": self.duration,
+            "progress": (
+                round(min(transcribed / self.duration, 1.0), 3)
+                if self.duration
+                else None
+            ),
+            "segments_done": len(self.segments),
+            "error": self.error,
+        }
+
+
+@dataclass
+class JobManager:
+    max_jobs: int
+    jobs: Dict[str, TranscriptionJob] = field(default_factory=dict)
+    queue: asyncio.Queue = field(default_factory=asyncio.Queue)
+    workers: List[asyncio.Task] = field(default_factory=list)
+    lookups: set = field(default_factory=set)
+    lookup: Optional[
+        Callable[[TranscriptionJob], Awaitable[Optional[Dict[str, Any]]]]
+    ] = None
+
+    def start(
+        self,
+        lookup: Callable[[TranscriptionJob], Awaitable[Optional[Dict[str, Any]]]],
+        run: Callable[[TranscriptionJob], Awaitable[Dict[str, Any]]],
+    ) -> None:
+        # Solo max_jobs trabajos usan el modelo a la vez; el resto espera en cola.
+        # La caché y los subtítulos (lookup) no pasan por la cola.
+        self.lookup = lookup
+        self.workers = [
+            asyncio.create_task(self._worker(run)) for _ in range(self.max_jobs)
+        ]
+
+    async def stop(self) -> None:
+        for task in [*self.workers, *self.lookups]:
+            task.cancel()
+
+        await asyncio.gather(*self.workers, *self.lookups, return_exceptions=True)
+
+    def submit(self, url: str, method: str) -> TranscriptionJob:
+        self._prune()
+
+        # Si el mismo video ya está en curso se reutiliza su trabajo
+        for job in self.jobs.values():
+            if job.url == url and job.method == method and not job.finished:
+                return job
+
+        job = TranscriptionJob(
+            id=f"{video_id_from_url(url)}-{uuid.uuid4().hex[:8]}",
+            url=url,
+            method=method,
+        )
+        self.jobs[job.id] = job
+
+        task = asyncio.create_task(self._lookup(job))
+        self.lookups.add(task)
+        task.add_done_callback(self.lookups.discard)
+
+        return job
+
+    async def _lookup(self, job: TranscriptionJob) -> None:
+        # Un acierto de caché o de subtítulos termina el trabajo sin esperar
+        # detrás de las transcripciones con Whisper; si no, pasa a la cola
+        try:
+            job.result = await self.lookup(job)
+        except Exception as e:
+            self._finish(job, error=str(e))
+            return
+
+        if job.result is None:
+            self.queue.put_nowait(job)
+        else:
+            self._finish(job)
+
+    def _finish(self, job: TranscriptionJob, error: Optional[str] = None) -> None:
+        job.status = "done" if error is None else "error"
+        job.error = error
+        job.finished_at = time.time()
+        job.notify()
+
+    def _prune(self) -> None:
+        now = time.time()
+
+        for job_id in [
+            job.id
+            for job in self.jobs.values()
+            if job.finished and now - job.finished_at > JOB_RETENTION_SECONDS
+        ]:
+            del self.jobs[job_id]
+
+    async def _worker(
+        self, run: Callable[[TranscriptionJob], Awaitable[Dict[str, Any]]]
+    ) -> None:
+        while True:
+            job = await self.queue.get()
+            job.status = "running"
+            job.notify()
+
+            try:
+                job.result = await run(job)
+                self._finish(job)
+            except Exception as e:
+                self._finish(job, error=str(e))
+            finally:
+                self.queue.task_done()
+
+
+def resolve_device() -> str:
+    if WHISPER_DEVICE:
+        return WHISPER_DEVICE
+
+    import torch
+
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+
+def create_transcriber() -> Transcriber:
+    device = resolve_device()
+    backend = resolve_backend(TRANSCRIBE_BACKEND)
+
+    return Transcriber(
+        model_name=select_model(backend, device, TRANSCRIBE_WORKERS, None),
+        device=device,
+        workers=TRANSCRIBE_WORKERS,
+        backend=backend,
+    )
+
+
+@dataclass
+class AppContext:
+    transcript_cache: TranscriptCache
+    jobs: JobManager
+    transcriber_task: Optional[asyncio.Task] = None
+
+    async def get_transcriber(self) -> Transcriber:
+        # El Transcriber (y con él torch) se crea en la primera transcripción o
+        # en el warm-up, en un hilo para no bloquear el event loop
+        if self.transcriber_task is None:
+            self.transcriber_task = asyncio.create_task(
+                asyncio.to_thread(create_transcriber)
+            )
+
+        task = self.transcriber_task
+
+        try:
+            return await asyncio.shield(task)
+        except Exception:
+            # Si falla (p. ej. configuración inválida) la siguiente llamada reintenta
+            if self.transcriber_task is task:
+                self.transcriber_task = None
+            raise
+
+    async def close_transcriber(self) -> None:
+        if self.transcriber_task is None:
+            return
+
+        try:
+            transcriber = await self.transcriber_task
+        except Exception:
+            return
+
+        # Al apagar el servidor sí se espera a los workers, pero en un hilo
+        await asyncio.to_thread(transcriber.close, True)
+
+    def discard_transcriber(self, transcriber: Transcriber) -> None:
+        # Un executor roto (initializer que falla o worker que muere) rechaza
+        # todas las tareas siguientes: se cierra y la próxima llamada crea otro
+        task = self.transcriber_task
+        if (
+            task is not None
+            and task.done()
+            and not task.cancelled()
+            and task.exception() is None
+            and task.result() is transcriber
+        ):
+            self.transcriber_task = None
+
+        transcriber.close()
+
+
+async def warmup(app: AppContext) -> None:
+    try:
+        transcriber = await app.get_transcriber()
+        await transcriber.warmup()
+    except BrokenExecutor as e:
+        app.discard_transcriber(transcriber)
+        logger.warning("Error en el warm-up de Whisper: %s", e)
+    except Exception as e:
+        logger.warning("Error en el warm-up de Whisper: %s", e)
+
+
+@asynccontextmanager
+async def app_lifespan(_: FastMCP) -> AsyncIterator[AppContext]:
+    transcript_cache = TranscriptCache(
+        path=TRANSCRIPT_CACHE_PATH, max_bytes=TRANSCRIPT_CACHE_MAX_BYTES
+    )
+
+    jobs = JobManager(max_jobs=TRANSCRIBE_MAX_JOBS)
+
+    app = AppContext(transcript_cache=transcript_cache, jobs=jobs)
+    jobs.start(
+        lookup=lambda job: find_transcript(app, job.url, job.method),
+        run=lambda job: transcribe_with_whisper(app, job.url, job),
+    )
+
+    # El warm-up corre en segundo plano: el servidor responde a initialize y
+    # tools/list mientras se importan torch y whisper y se carga el modelo
+    warmup_task = asyncio.create_task(warmup(app)) if WHISPER_WARMUP else None
+
+    try:
+        yield app
+    finally:
+        if warmup_task is not None:
+            warmup_task.cancel()
+            await asyncio.gather(warmup_task, return_exceptions=True)
+
+        await jobs.stop()
+        await app.close_transcriber()
+        transcript_cache.close()
+
+
+mcp = FastMCP("server weather", lifespan=app_lifespan)
+
+
+def fetch_captions(video_id: str) -> Optional[Dict[str, Any]]:
+    from youtube_transcript_api import NoTranscriptFound, YouTubeTranscriptApi
+
+    transcript_list = YouTubeTranscriptApi().list(video_id)
+    languages = ([WHISPER_LANGUAGE] if WHISPER_LANGUAGE else []) + CAPTION_LANGUAGES
+
+    # find_transcript prioriza los subtítulos manuales sobre los automáticos;
+    # si ninguno está en los idiomas preferidos se usa el primero disponible
+    try:
+        transcript = transcript_list.find_transcript(languages)
+    except NoTranscriptFound:
+        transcript = next(iter(transcript_list), None)
+
+    if transcript is None:
+        return None
+
+    fetched = transcript.fetch()
+    segments = [
+        {
+            "start": round(snippet.start, 2),
+            "end": round(snippet.start + snippet.duration, 2),
+            "text": snippet.text.strip(),
+        }
+        for snippet in fetched
+    ]
+
+    return {
+        "text": " ".join(segment["text"] for segment in segments),
+        "language": fetched.language_code,
+        "generated": fetched.is_generated,
+        "segments": segments,
+    }
+
+
+def download_yt(url="https://www.youtube.com/watch?v=-w53i6Ae-YM", path=".") -> str:
+    from pytubefix import YouTube
 
-def download_yt(url="https://www.youtube.com/watch?v=-w53i6Ae-YM", path="."):
     yt = YouTube(url)
 
     ys = yt.streams.get_audio_only()
-    ys.download(output_path=path, filename="audio.mp4")
 
+    return ys.download(output_path=path, filename="audio.mp4")
+
+
+async def find_transcript(
+    app: AppContext, url: str, method: str = "auto"
+) -> Optional[Dict[str, Any]]:
+    # Caché y subtítulos, sin usar el modelo. None si hace falta Whisper
+    if method not in ("auto", "captions", "whisper"):
+        raise ValueError(
+            f"Método no soportado: '{method}' (usa auto, captions o whisper)"
+        )
+
+    video_id = video_id_from_url(url)
+    language = WHISPER_LANGUAGE or "auto"
+
+    # 1. Subtítulos de YouTube (oficiales o automáticos): sin descarga ni inferencia
+    if method in ("auto", "captions"):
+        cached = app.transcript_cache.get(video_id, "captions", language)
+        if cached is not None:
+            return {
+                "video_id": video_id,
+                "source": "captions",
+                "cached": True,
+                **cached,
+            }
+
+        try:
+            captions = await asyncio.to_thread(fetch_captions, video_id)
+        except Exception as e:
+            # En modo auto cualquier fallo (sin subtítulos, red, bloqueo de
+            # YouTube, cambios en su API) pasa a Whisper en lugar de abortar
+            if method == "captions":
+                raise
+            logger.info(
+                "Sin subtítulos para %s (%s), usando Whisper",
+                video_id,
+                type(e).__name__,
+            )
+            captions = None
+
+        if captions is not None:
+            app.transcript_cache.put(video_id, "captions", language, captions)
+            return {
+                "video_id": video_id,
+                "source": "captions",
+                "cached": False,
+                **captions,
+            }
+
+        if method == "captions":
+            raise ValueError(f"El video {video_id} no tiene subtítulos")
 
-def transcibe_audio(path: str = "audio.mp4"):
-    device = "cuda" if torch.cuda.is_available() else "cpu"
-    print(f"Using device: {device}")
+    # 2. Transcripción de Whisper ya guardada
+    for key in candidate_models(resolve_backend(TRANSCRIBE_BACKEND)):
+        cached = app.transcript_cache.get(video_id, key, language)
+        if cached is not None:
+            return {"video_id": video_id, "source": "whisper", "cached": True, **cached}
 
-    model = whisper.load_model("medium", device=device)
-    result = model.transcribe(path)
+    return None
 
-    return result["text"]
+
+async def transcribe_with_whisper(
+    app: AppContext, url: str, job: Optional[TranscriptionJob] = None
+) -> Dict[str, Any]:
+    # 3. Descarga del audio y transcripción con Whisper
+    video_id = video_id_from_url(url)
+    language = WHISPER_LANGUAGE or "auto"
+
+    transcriber = await app.get_transcriber()
+
+    on_segments = job.add_segments if job is not None else None
+    stream = await asyncio.to_thread(AudioStream, url)
+
+    if job is not None:
+        job.duration = stream.duration
+        job.notify()
+
+    # Con WHISPER_MODEL=auto el tamaño del modelo depende de la duración
+    model_name = transcriber.select_model(stream.duration)
+
+    try:
+        transcript = await transcriber.transcribe_stream(
+            stream, model_name, on_segments
+        )
+    except BrokenExecutor:
+        app.discard_transcriber(transcriber)
+        raise
+    except AudioDecodeError:
+        if stream.samples:
+            raise
+
+        # Si ffmpeg no puede leer el stream directamente se descarga el archivo
+        # en un directorio temporal propio de esta petición, que se borra al final
+        with tempfile.TemporaryDirectory(prefix="yt-audio-") as workspace:
+            audio_path = await asyncio.to_thread(download_yt, url, workspace)
+
+            # -------------
+            # -------------
+
+            # OPENAI
+
+            # client = OpenAI(
+            #     api_key=""
+            # )
+            # audio_file = open(audio_path, "rb")
+            #
+            # transcription = client.audio.transcriptions.create(
+            #     model="gpt-4o-mini-transcribe",
+            #     file=audio_file,
+            #     response_format="text",
+            # )
+            #
+            # -------------
+            # -------------
+
+            try:
+                transcript = await transcriber.transcribe_file(
+                    audio_path, model_name, on_segments
+                )
+            except BrokenExecutor:
+                app.discard_transcriber(transcriber)
+                raise
+
+    app.transcript_cache.put(video_id, transcript["model"], language, transcript)
+
+    return {"video_id": video_id, "source": "whisper", "cached": False, **transcript}
 
 
 @mcp.tool(
     name="download_youtube_video",
-    description="Descarga y transcribe un video de YouTube.",
+    description=(
+        "Obtiene la transcripción de un video de YouTube. Usa los subtítulos del "
+        "video si existen y, si no, descarga el audio y lo transcribe con Whisper."
+    ),
 )
-async def download_youtube_video(url: str, path: str = ".") -> str:
+async def download_youtube_video(
+    url: str, ctx: Context, method: str = "auto"
+) -> Dict[str, Any]:
+    """
+    Args:
+        url: URL o ID del video de YouTube.
+        method: "auto" (subtítulos y, si no hay, Whisper), "captions" (solo
+            subtítulos) o "whisper" (siempre descarga y transcribe).
+
+    Returns:
+        Diccionario con 'video_id', 'source' ("captions" o "whisper"), 'cached',
+        'language' y 'text'.
+    """
     try:
-        download_yt(url, path)
+        context_app: AppContext = ctx.request_context.lifespan_context
+
+        # La caché y los subtítulos responden de inmediato; solo Whisper pasa
+        # por la cola para respetar el límite de inferencias simultáneas,
+        # informando el progreso mientras espera
+        job = context_app.jobs.submit(url, method)
+        await wait_for_job(job, ctx)
+
+        if job.status == "error":
+            return {"error": f"Error al descargar el video: {job.error}"}
+
+        # Los segmentos con marcas de tiempo quedan en la caché; al agente solo
+        # se le devuelve el texto
+        transcript = {k: v for k, v in job.result.items() if k != "segments"}
+
+        # print(transcript["text"])
 
-        # -------------
-        # -------------
+        return transcript
+    except Exception as e:
+        return {"error": f"Error al descargar el video: {str(e)}"}
+
+
+async def wait_for_job(
+    job: TranscriptionJob, ctx: Context, timeout: Optional[float] = None
+) -> None:
+    # Mientras espera envía al cliente notificaciones de progreso (segundos
+    # transcritos sobre la duración) y cada segmento nuevo como mensaje de log
+    loop = asyncio.get_running_loop()
+    deadline = None if timeout is None else loop.time() + timeout
+    reported = len(job.segments)
+
+    while not job.finished:
+        remaining = None if deadline is None else deadline - loop.time()
+        if remaining is not None and remaining <= 0:
+            break
+
+        try:
+            await asyncio.wait_for(job.changed.wait(), remaining)
+        except asyncio.TimeoutError:
+            break
+
+        for segment in job.segments[reported:]:
+            await ctx.info(f"[{segment['start']:.0f}s] {segment['text']}")
+        reported = len(job.segments)
+
+        if job.duration:
+            await ctx.report_progress(
+                job.status_dict()["transcribed_seconds"], job.duration
+            )
+
+
+def cached_transcript(app: AppContext, video_id: str) -> Optional[Dict[str, Any]]:
+    language = WHISPER_LANGUAGE or "auto"
+
+    keys = [("captions", "captions")] + [
+        ("whisper", key)
+        for key in candidate_models(resolve_backend(TRANSCRIBE_BACKEND))
+    ]
 
-        # OPENAI
+    for source, key in keys:
+        cached = app.transcript_cache.get(video_id, key, language)
+        if cached is not None:
+            return {"video_id": video_id, "source": source, "cached": True, **cached}
 
-        # client = OpenAI(
-        #     api_key=""
-        # )
-        # audio_file = open("audio.mp4", "rb")
-        #
-        # transcription = client.audio.transcriptions.create(
-        #     model="gpt-4o-mini-transcribe",
-        #     file=audio_file,
-        #     response_format="text",
-        # )
-        #
-        # -------------
-        # -------------
+    return None
+
+
+def find_job_result(app: AppContext, job_id: str) -> Optional[Dict[str, Any]]:
+    # Trabajos que ya no están en memoria (servidor reiniciado o trabajo
+    # expirado): el ID empieza por el ID del video, así que el resultado se
+    # recupera de la caché de transcripciones
+    video_id = job_id.rsplit("-", 1)[0]
+
+    return cached_transcript(app, video_id)
+
+
+@mcp.tool(
+    name="start_transcription",
+    description=(
+        "Inicia en segundo plano la transcripción de un video de YouTube y "
+        "devuelve un job_id para consultar su estado y resultado."
+    ),
+)
+async def start_transcription(
+    url: str, ctx: Context, method: str = "auto"
+) -> Dict[str, Any]:
+    """
+    Args:
+        url: URL o ID del video de YouTube.
+        method: "auto", "captions" o "whisper", igual que en download_youtube_video.
+
+    Returns:
+        Diccionario con 'job_id' y 'status'. Si el video ya está en la caché el
+        trabajo termina de inmediato.
+    """
+    try:
+        context_app: AppContext = ctx.request_context.lifespan_context
 
-        transcription = transcibe_audio()
+        job = context_app.jobs.submit(url, method)
+
+        return {"job_id": job.id, "status": job.status}
+    except Exception as e:
+        return {"error": f"Error al iniciar la transcripción: {str(e)}"}
+
+
+@mcp.tool(
+    name="get_transcription_status",
+    description=(
+        "Consulta el estado y progreso de un trabajo de transcripción. Puede "
+        "esperar hasta wait_seconds recibiendo el progreso en vivo."
+    ),
+)
+async def get_transcription_status(
+    job_id: str, ctx: Context, wait_seconds: float = 0
+) -> Dict[str, Any]:
+    """
+    Args:
+        job_id: ID devuelto por start_transcription.
+        wait_seconds: Segundos a esperar a que el trabajo avance o termine
+            (máximo 300). Mientras espera se envían notificaciones de progreso.
+
+    Returns:
+        Diccionario con 'job_id', 'status' (queued, running, done, error),
+        'progress' (0 a 1, si se conoce la duración), 'transcribed_seconds',
+        'duration', 'segments_done' y 'error'.
+    """
+    try:
+        context_app: AppContext = ctx.request_context.lifespan_context
+
+        job = context_app.jobs.jobs.get(job_id)
+
+        if job is None:
+            if find_job_result(context_app, job_id) is not None:
+                return {"job_id": job_id, "status": "done", "progress": 1.0}
+
+            return {"error": f"No existe el trabajo '{job_id}'"}
+
+        await wait_for_job(job, ctx, timeout=min(max(wait_seconds, 0), 300))
+
+        return job.status_dict()
+    except Exception as e:
+        return {"error": f"Error al consultar el trabajo: {str(e)}"}
+
+
+@mcp.tool(
+    name="get_transcription_result",
+    description=(
+        "Obtiene la transcripción de un trabajo. Si aún no termina devuelve su "
+        "estado y el texto parcial transcrito hasta el momento."
+    ),
+)
+async def get_transcription_result(
+    job_id: str, ctx: Context, include_segments: bool = False
+) -> Dict[str, Any]:
+    """
+    Args:
+        job_id: ID devuelto por start_transcription.
+        include_segments: Si es True incluye los segmentos con marcas de tiempo.
+
+    Returns:
+        Si el trabajo terminó, el mismo diccionario que download_youtube_video.
+        Si no, el estado del trabajo con 'partial_text'.
+    """
+    try:
+        context_app: AppContext = ctx.request_context.lifespan_context
+
+        job = context_app.jobs.jobs.get(job_id)
+
+        if job is None:
+            result = find_job_result(context_app, job_id)
+            if result is None:
+                return {"error": f"No existe el trabajo '{job_id}'"}
+        elif job.status == "error":
+            return {"job_id": job_id, "status": "error", "error": job.error}
+        elif job.status != "done":
+            return {
+                **job.status_dict(),
+                "partial_text": " ".join(s["text"] for s in job.segments),
+            }
+        else:
+            result = job.result
+
+        if not include_segments:
+            result = {k: v for k, v in result.items() if k != "segments"}
+
+        return {"job_id": job_id, "status": "done", **result}
+    except Exception as e:
+        return {"error": f"Error al obtener el resultado: {str(e)}"}
+
+
+@mcp.tool(
+    name="list_transcripts",
+    description="Lista las transcripciones guardadas en la caché local.",
+)
+async def list_transcripts(ctx: Context) -> List[Dict[str, Any]]:
+    try:
+        context_app: AppContext = ctx.request_context.lifespan_context
+
+        return context_app.transcript_cache.list_entries()
+    except Exception as e:
+        return [{"error": f"Error al listar transcripciones: {str(e)}"}]
+
+
+@mcp.tool(
+    name="purge_transcripts",
+    description="Elimina de la caché las transcripciones de un video, o todas si no se indica.",
+)
+async def purge_transcripts(ctx: Context, url: Optional[str] = None) -> Dict[str, Any]:
+    try:
+        context_app: AppContext = ctx.request_context.lifespan_context
 
-        # print(transcription)
+        video_id = video_id_from_url(url) if url else None
+        deleted = context_app.transcript_cache.purge(video_id)
 
-        return transcription
+        return {"success": True, "deleted": deleted}
     except Exception as e:
-        return f"Error al descargar el video: {str(e)}"
+        return {"success": False, "error": f"Error al purgar transcripciones: {str(e)}"}
 
 
 if __name__ == "__main__":
@@ -1,29 +1,63 @@
-import os
+import asyncio
+from typing import Optional
 
-import httpx
+from mcp.server.fastmcp import Context, FastMCP
 
-from mcp.server.fastmcp import FastMCP
+from weather_client import WeatherClient, close_weather_client, weather_lifespan
 
-mcp = FastMCP("server weather")
+mcp = FastMCP("server weather", lifespan=weather_lifespan)
 
 
 @mcp.tool(
     name="fetch_weather",
-    description="Consulta el clima actual de una ciudad usando la API de Visual Crossing.",
+    description=(
+        "Consulta el clima actual de una ciudad usando la API de Visual Crossing. "
+        "Devuelve un resumen compacto; usa fields para pedir otros campos."
+    ),
 )
-async def fetch_weather(city: str) -> dict:
-    WEATHER_API_KEY = os.getenv("WEATHER_API_KEY")
+async def fetch_weather(
+    city: str, ctx: Context, fields: Optional[list[str]] = None
+) -> dict:
+    """
+    Args:
+        city: Nombre de la ciudad.
+        fields: Campos a devolver de las condiciones actuales o del día (temp,
+            humidity, windspeed, conditions, uvindex, sunrise...). Por defecto
+            un resumen compacto; ["*"] devuelve la respuesta completa.
+    """
+    weather: WeatherClient = ctx.request_context.lifespan_context
 
-    if not WEATHER_API_KEY:
-        return {"error": "WEATHER_API_KEY no está configurada"}
+    return await weather.fetch(city, fields)
 
-    async with httpx.AsyncClient() as client:
-        resp = await client.get(
-            f"https://weather.visualcrossing.com/VisualCrossingWebServices/rest/services/timeline/{city}/today?unitGroup=metric&include=current&key={WEATHER_API_KEY}&contentType=json"
-        )
 
-    return resp.json()
+@mcp.tool(
+    name="fetch_weather_many",
+    description=(
+        "Consulta en paralelo el clima actual de varias ciudades en una sola "
+        "llamada. Úsala en lugar de llamar fetch_weather una vez por ciudad."
+    ),
+)
+async def fetch_weather_many(
+    cities: list[str], ctx: Context, fields: Optional[list[str]] = None
+) -> dict:
+    """
+    Args:
+        cities: Nombres de las ciudades.
+        fields: Campos a devolver por ciudad, igual que en fetch_weather.
+    """
+    weather: WeatherClient = ctx.request_context.lifespan_context
+
+    # Resultado por ciudad; las que fallan traen {"error": ...} sin afectar al resto
+    return await weather.fetch_many(cities, fields)
+
+
+async def main() -> None:
+    # Con stdio hay una sola sesión; el cliente del clima se cierra al terminar
+    try:
+        await mcp.run_stdio_async()
+    finally:
+        await close_weather_client()
 
 
 if __name__ == "__main__":
-    mcp.run(transport="stdio")
+    asyncio.run(main())
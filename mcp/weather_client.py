@@ -0,0 +1,459 @@
+import asyncio
+import os
+import random
+import time
+from collections import OrderedDict, deque
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from importlib.util import find_spec
+from typing import Any, Dict, List, Optional
+from urllib.parse import quote
+
+import httpx
+from dotenv import load_dotenv
+from starlette.applications import Starlette
+
+from mcp.server.fastmcp import FastMCP
+
+load_dotenv(override=True)
+
+WEATHER_API_URL = "https://weather.visualcrossing.com/VisualCrossingWebServices/rest/services/timeline"
+
+# Timeouts explícitos en segundos: sin ellos una herramienta puede quedar
+# esperando indefinidamente a Visual Crossing
+WEATHER_CONNECT_TIMEOUT = float(os.getenv("WEATHER_CONNECT_TIMEOUT") or "3")
+WEATHER_READ_TIMEOUT = float(os.getenv("WEATHER_READ_TIMEOUT") or "10")
+
+# Pool de conexiones keep-alive compartido entre llamadas, así solo la primera
+# petición paga el handshake TCP + TLS
+WEATHER_MAX_CONNECTIONS = int(os.getenv("WEATHER_MAX_CONNECTIONS") or "10")
+WEATHER_KEEPALIVE_SECONDS = float(os.getenv("WEATHER_KEEPALIVE_SECONDS") or "60")
+
+# Con WEATHER_HTTP2=1 las peticiones concurrentes se multiplexan en una sola
+# conexión HTTP/2. Requiere el paquete h2 (pip install httpx[http2]), que no es
+# una dependencia del proyecto: sin él se sigue usando HTTP/1.1
+H2_INSTALLED = find_spec("h2") is not None
+WEATHER_HTTP2 = (os.getenv("WEATHER_HTTP2") or "0") == "1" and H2_INSTALLED
+
+# Caché en memoria por ciudad: durante WEATHER_CACHE_TTL segundos la respuesta
+# se sirve sin consultar la API; después, y hasta WEATHER_CACHE_STALE segundos
+# más, se sirve la respuesta anterior mientras se actualiza en segundo plano
+WEATHER_CACHE_TTL = float(os.getenv("WEATHER_CACHE_TTL") or "600")
+WEATHER_CACHE_STALE = float(os.getenv("WEATHER_CACHE_STALE") or "3600")
+WEATHER_CACHE_MAX_ENTRIES = int(os.getenv("WEATHER_CACHE_MAX_ENTRIES") or "512")
+
+# Máximo de peticiones simultáneas a la API, p. ej. en fetch_weather_many
+WEATHER_MAX_CONCURRENCY = int(
+    os.getenv("WEATHER_MAX_CONCURRENCY") or str(WEATHER_MAX_CONNECTIONS)
+)
+
+
+# Hedging: si la petición no responde en el percentil WEATHER_HEDGE_PERCENTILE de
+# las latencias recientes (mínimo WEATHER_HEDGE_MIN_DELAY segundos) se lanza una
+# segunda y se usa la primera que responda. Con percentil 0 se desactiva
+WEATHER_HEDGE_PERCENTILE = float(os.getenv("WEATHER_HEDGE_PERCENTILE") or "0.95")
+WEATHER_HEDGE_MIN_DELAY = float(os.getenv("WEATHER_HEDGE_MIN_DELAY") or "0.3")
+
+# Reintentos ante timeouts, errores de red, 429 y 5xx, con espera exponencial
+# aleatoria (full jitter) a partir de WEATHER_RETRY_BACKOFF segundos
+WEATHER_RETRIES = int(os.getenv("WEATHER_RETRIES") or "2")
+WEATHER_RETRY_BACKOFF = float(os.getenv("WEATHER_RETRY_BACKOFF") or "0.5")
+
+# Circuit breaker: tras WEATHER_BREAKER_FAILURES fallos seguidos no se consulta
+# la API durante WEATHER_BREAKER_RESET segundos y se responde desde la caché
+WEATHER_BREAKER_FAILURES = int(os.getenv("WEATHER_BREAKER_FAILURES") or "5")
+WEATHER_BREAKER_RESET = float(os.getenv("WEATHER_BREAKER_RESET") or "30")
+
+# Campos que devuelven las herramientas si no se piden otros. Se buscan primero
+# en las condiciones actuales y luego en el resumen del día; con ["*"] se
+# devuelve la respuesta completa de Visual Crossing
+WEATHER_DEFAULT_FIELDS = [
+    "datetime",
+    "conditions",
+    "temp",
+    "feelslike",
+    "humidity",
+    "windspeed",
+    "winddir",
+    "precipprob",
+    "tempmin",
+    "tempmax",
+    "description",
+]
+
+
+def project_weather(
+    data: Dict[str, Any], fields: Optional[List[str]] = None
+) -> Dict[str, Any]:
+    # La respuesta completa incluye estaciones, variantes de la dirección y el
+    # bloque del día entero; el agente rara vez necesita más que unos campos
+    if "error" in data or fields == ["*"]:
+        return data
+
+    current = data.get("currentConditions") or {}
+    today = (data.get("days") or [{}])[0]
+
+    result = {"city": data.get("resolvedAddress"), "timezone": data.get("timezone")}
+
+    if data.get("stale"):
+        result["stale"] = True
+
+    for name in fields or WEATHER_DEFAULT_FIELDS:
+        if name in current:
+            result[name] = current[name]
+        elif name in today:
+            result[name] = today[name]
+
+    return result
+
+
+def normalize_city(city: str) -> str:
+    return " ".join(city.split()).casefold()
+
+
+class UpstreamError(Exception):
+    def __init__(self, message: str, retryable: bool) -> None:
+        super().__init__(message)
+        self.retryable = retryable
+
+
+@dataclass
+class LatencyTracker:
+    samples: deque = field(default_factory=lambda: deque(maxlen=100))
+
+    def record(self, seconds: float) -> None:
+        self.samples.append(seconds)
+
+    def hedge_delay(self) -> Optional[float]:
+        if WEATHER_HEDGE_PERCENTILE <= 0:
+            return None
+
+        # Sin suficientes muestras se espera la mitad del timeout de lectura
+        # antes de duplicar la petición
+        if len(self.samples) < 10:
+            return max(WEATHER_HEDGE_MIN_DELAY, WEATHER_READ_TIMEOUT / 2)
+
+        ordered = sorted(self.samples)
+        index = int(WEATHER_HEDGE_PERCENTILE * (len(ordered) - 1))
+
+        return max(WEATHER_HEDGE_MIN_DELAY, ordered[index])
+
+
+@dataclass
+class CircuitBreaker:
+    failures: int = 0
+    opened_at: Optional[float] = None
+    probing: bool = False
+
+    @property
+    def open(self) -> bool:
+        return (
+            self.opened_at is not None
+            and time.monotonic() - self.opened_at < WEATHER_BREAKER_RESET
+        )
+
+    def allow(self) -> bool:
+        if self.opened_at is None:
+            return True
+
+        if self.open or self.probing:
+            return False
+
+        # Medio abierto: pasado el tiempo de espera se deja pasar una petición
+        # de prueba que decide si el circuito se cierra o vuelve a abrirse
+        self.probing = True
+        return True
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+
+        if self.probing or self.failures >= WEATHER_BREAKER_FAILURES:
+            self.opened_at = time.monotonic()
+            self.probing = False
+
+
+@dataclass
+class CacheEntry:
+    value: Dict[str, Any]
+    fresh_until: float
+    stale_until: float
+
+
+@dataclass
+class WeatherClient:
+    client: httpx.AsyncClient
+    cache: "OrderedDict[str, CacheEntry]" = field(default_factory=OrderedDict)
+    inflight: Dict[str, asyncio.Task] = field(default_factory=dict)
+    limiter: asyncio.Semaphore = field(
+        default_factory=lambda: asyncio.Semaphore(WEATHER_MAX_CONCURRENCY)
+    )
+    latency: LatencyTracker = field(default_factory=LatencyTracker)
+    breaker: CircuitBreaker = field(default_factory=CircuitBreaker)
+
+    async def fetch(
+        self, city: str, fields: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        # La caché guarda la respuesta completa; cada llamada proyecta sus campos
+        return project_weather(await self._get(city), fields)
+
+    async def _get(self, city: str) -> Dict[str, Any]:
+        key = normalize_city(city)
+        now = time.monotonic()
+        entry = self.cache.get(key)
+
+        if entry is not None and now < entry.stale_until:
+            self.cache.move_to_end(key)
+
+            # Stale-while-revalidate: la respuesta vencida se sirve de inmediato
+            # y se actualiza en segundo plano
+            if now >= entry.fresh_until:
+                self._refresh(key, city)
+
+            return entry.value
+
+        # Con la API caída se responde al instante con la última respuesta
+        # conocida, aunque haya vencido la ventana de stale
+        if entry is not None and self.breaker.open:
+            return {**entry.value, "stale": True}
+
+        # shield: si el llamador se cancela, la petición compartida sigue para
+        # el resto de llamadores que la esperan
+        return await asyncio.shield(self._refresh(key, city))
+
+    async def fetch_many(
+        self, cities: List[str], fields: Optional[List[str]] = None
+    ) -> Dict[str, Dict[str, Any]]:
+        async def fetch_one(city: str) -> Dict[str, Any]:
+            # Un fallo inesperado en una ciudad no afecta al resto
+            try:
+                return await self.fetch(city, fields)
+            except Exception as e:
+                return {"error": f"Error al consultar el clima: {e!r}"}
+
+        cities = list(dict.fromkeys(cities))
+        results = await asyncio.gather(*(fetch_one(city) for city in cities))
+
+        return dict(zip(cities, results))
+
+    def _refresh(self, key: str, city: str) -> asyncio.Task:
+        # Single-flight: las peticiones concurrentes de la misma ciudad comparten
+        # una sola llamada a la API
+        task = self.inflight.get(key)
+
+        if task is None:
+            task = asyncio.create_task(self._load(key, city))
+            task.add_done_callback(lambda _: self.inflight.pop(key, None))
+            self.inflight[key] = task
+
+        return task
+
+    async def _load(self, key: str, city: str) -> Dict[str, Any]:
+        data = await self._request(city)
+
+        # Los errores no se guardan: la siguiente llamada vuelve a intentarlo.
+        # Mientras tanto se prefiere la última respuesta conocida al error
+        if "error" in data:
+            entry = self.cache.get(key)
+            if entry is not None and data.get("retryable"):
+                return {**entry.value, "stale": True}
+
+            data.pop("retryable", None)
+        else:
+            now = time.monotonic()
+            self.cache[key] = CacheEntry(
+                value=data,
+                fresh_until=now + WEATHER_CACHE_TTL,
+                stale_until=now + WEATHER_CACHE_TTL + WEATHER_CACHE_STALE,
+            )
+            self.cache.move_to_end(key)
+
+            while len(self.cache) > WEATHER_CACHE_MAX_ENTRIES:
+                self.cache.popitem(last=False)
+
+        return data
+
+    async def close(self) -> None:
+        for task in self.inflight.values():
+            task.cancel()
+
+        await asyncio.gather(*self.inflight.values(), return_exceptions=True)
+
+    async def _request(self, city: str) -> Dict[str, Any]:
+        api_key = os.getenv("WEATHER_API_KEY")
+
+        if not api_key:
+            return {"error": "WEATHER_API_KEY no está configurada"}
+
+        # Circuito abierto: se falla de inmediato en lugar de esperar a la API
+        if not self.breaker.allow():
+            return {
+                "error": "Visual Crossing no está disponible, reintenta más tarde",
+                "retryable": True,
+            }
+
+        for attempt in range(WEATHER_RETRIES + 1):
+            try:
+                data = await self._hedged(city, api_key)
+            except UpstreamError as e:
+                if not e.retryable:
+                    # La API respondió (ciudad inválida, clave incorrecta...):
+                    # no cuenta como fallo del servicio
+                    self.breaker.record_success()
+                    return {"error": str(e)}
+
+                self.breaker.record_failure()
+                error = str(e)
+
+                if attempt == WEATHER_RETRIES or self.breaker.open:
+                    break
+
+                await asyncio.sleep(
+                    random.uniform(0, WEATHER_RETRY_BACKOFF * 2**attempt)
+                )
+            else:
+                self.breaker.record_success()
+                return data
+
+        return {"error": error, "retryable": True}
+
+    async def _hedged(self, city: str, api_key: str) -> Dict[str, Any]:
+        # Petición de respaldo: si la primera tarda más que el percentil de
+        # latencia se lanza una segunda y gana la primera que responda bien
+        attempts = [asyncio.create_task(self._attempt(city, api_key))]
+        delay = self.latency.hedge_delay()
+
+        try:
+            while True:
+                done, pending = await asyncio.wait(
+                    [task for task in attempts if not task.done()],
+                    timeout=delay if len(attempts) == 1 else None,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+
+                if not done:
+                    attempts.append(asyncio.create_task(self._attempt(city, api_key)))
+                    continue
+
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+
+                # Un error de la API (4xx), o el fallo de la única petición, se
+                # devuelve sin esperar al respaldo; los reintentos se hacen fuera
+                error = done.pop().exception()
+                if not pending or not getattr(error, "retryable", False):
+                    raise error
+        finally:
+            for task in attempts:
+                task.cancel()
+
+    async def _attempt(self, city: str, api_key: str) -> Dict[str, Any]:
+        started = time.monotonic()
+
+        try:
+            async with self.limiter:
+                resp = await self.client.get(
+                    f"/{quote(city)}/today",
+                    params={
+                        "unitGroup": "metric",
+                        "include": "current",
+                        "key": api_key,
+                        "contentType": "json",
+                    },
+                )
+        except httpx.HTTPError as e:
+            raise UpstreamError(f"Error al consultar el clima: {e!r}", True)
+
+        if resp.is_error:
+            raise UpstreamError(
+                f"Visual Crossing respondió {resp.status_code}: {resp.text.strip()}",
+                resp.status_code == 429 or resp.status_code >= 500,
+            )
+
+        try:
+            data = resp.json()
+        except ValueError:
+            raise UpstreamError(
+                "Visual Crossing devolvió una respuesta no válida", True
+            )
+
+        self.latency.record(time.monotonic() - started)
+
+        return data
+
+
+def create_http_client(base_url: str = WEATHER_API_URL) -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        base_url=base_url,
+        http2=WEATHER_HTTP2,
+        timeout=httpx.Timeout(
+            WEATHER_READ_TIMEOUT,
+            connect=WEATHER_CONNECT_TIMEOUT,
+            pool=WEATHER_CONNECT_TIMEOUT,
+        ),
+        limits=httpx.Limits(
+            max_connections=WEATHER_MAX_CONNECTIONS,
+            max_keepalive_connections=WEATHER_MAX_CONNECTIONS,
+            keepalive_expiry=WEATHER_KEEPALIVE_SECONDS,
+        ),
+    )
+
+
+# Un solo WeatherClient por proceso. Con streamable-HTTP el lifespan de FastMCP
+# se ejecuta en cada sesión de cliente: la caché, el single-flight, el pool de
+# conexiones y el circuit breaker deben compartirse entre todas ellas
+_weather_client: Optional[WeatherClient] = None
+
+
+def get_weather_client() -> WeatherClient:
+    global _weather_client
+
+    if _weather_client is None:
+        _weather_client = WeatherClient(client=create_http_client())
+
+    return _weather_client
+
+
+async def close_weather_client() -> None:
+    global _weather_client
+
+    if _weather_client is None:
+        return
+
+    weather, _weather_client = _weather_client, None
+
+    try:
+        await weather.close()
+    finally:
+        await weather.client.aclose()
+
+
+@asynccontextmanager
+async def weather_lifespan(_: FastMCP) -> AsyncIterator[WeatherClient]:
+    # Cada sesión recibe el cliente del proceso; se cierra al apagar el servidor
+    # (close_weather_client), no al terminar la sesión
+    yield get_weather_client()
+
+
+def with_weather_client(app: Starlette) -> Starlette:
+    # Cierra el cliente compartido en el lifespan de la aplicación HTTP, que
+    # corre una sola vez por proceso
+    app_lifespan = app.router.lifespan_context
+
+    @asynccontextmanager
+    async def lifespan(app: Starlette) -> AsyncIterator[None]:
+        async with app_lifespan(app):
+            try:
+                yield
+            finally:
+                await close_weather_client()
+
+    app.router.lifespan_context = lifespan
+
+    return app
@@ -0,0 +1,279 @@
+import asyncio
+import datetime
+import decimal
+import json
+import time
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+
+import pytest
+
+import server_db
+from server_db import AppContext, Database
+
+SLOW_QUERY_SECONDS = 1.0
+
+
+class FakeCursor:
+    """Cursor async mínimo: las consultas con pg_sleep tardan SLOW_QUERY_SECONDS."""
+
+    def __init__(self, tables, rows):
+        self.tables = tables
+        self.rows = rows
+        self.result = []
+        self.description = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, query, params=None):
+        query = str(query)
+
+        if query.startswith("EXPLAIN"):
+            # Plan de la consulta paginada: Limit sobre la consulta original
+            self.result = [
+                {
+                    "QUERY PLAN": [
+                        {
+                            "Plan": {
+                                "Node Type": "Limit",
+                                "Total Cost": 1.0,
+                                "Plan Rows": 1,
+                                "Plans": [{"Node Type": "Result", "Plan Rows": 1}],
+                            }
+                        }
+                    ]
+                }
+            ]
+            return
+
+        if "pg_sleep" in query:
+            await asyncio.sleep(SLOW_QUERY_SECONDS)
+
+        if "information_schema.tables" in query:
+            self.result = [{"table_name": name} for name in self.tables]
+        else:
+            self.result = list(self.rows)
+
+        columns = list(self.result[0]) if self.result else ["value"]
+        self.description = [SimpleNamespace(name=column) for column in columns]
+
+    async def fetchone(self):
+        return self.result[0]
+
+    async def fetchall(self):
+        return self.result
+
+    async def fetchmany(self, size):
+        return self.result[:size]
+
+
+class FakeConnection:
+    def __init__(self, tables, rows):
+        self.tables = tables
+        self.rows = rows
+
+    def cursor(self, row_factory=None):
+        return FakeCursor(self.tables, self.rows)
+
+
+class FakePool:
+    """Pool con conexiones independientes, como AsyncConnectionPool."""
+
+    def __init__(self, tables=(), rows=()):
+        self.tables = list(tables)
+        self.rows = list(rows)
+
+    @asynccontextmanager
+    async def connection(self):
+        yield FakeConnection(self.tables, self.rows)
+
+
+def make_ctx(pool: FakePool) -> SimpleNamespace:
+    app = AppContext(db=Database(pool=pool))
+    return SimpleNamespace(request_context=SimpleNamespace(lifespan_context=app))
+
+
+def test_slow_query_does_not_block_list_tables():
+    ctx = make_ctx(FakePool(tables=["clientes", "pedidos"], rows=[{"value": 1}]))
+
+    async def scenario():
+        slow = asyncio.create_task(
+            server_db.execute_query("SELECT pg_sleep(1) AS value", ctx)
+        )
+        await asyncio.sleep(0.05)
+
+        start = time.perf_counter()
+        tables = await server_db.list_tables(ctx)
+        elapsed = time.perf_counter() - start
+
+        assert not slow.done()
+        result = await slow
+
+        return tables, elapsed, result
+
+    tables, elapsed, result = asyncio.run(scenario())
+
+    assert tables == ["clientes", "pedidos"]
+    assert elapsed < SLOW_QUERY_SECONDS / 10
+    assert result["rows"] == [{"value": 1}]
+
+
+def sample_rows(count: int):
+    return [
+        {
+            "pedido_id": i,
+            "cliente_nombre": f"Cliente {i}",
+            "importe_total": decimal.Decimal(f"{i}.99"),
+            "fecha_creacion": datetime.datetime(2025, 1, 1, 12, 0)
+            + datetime.timedelta(hours=i),
+            "firma_digital": bytes([i % 256, 0xFF]),
+        }
+        for i in range(count)
+    ]
+
+
+def test_compact_formats_reduce_payload_size():
+    ctx = make_ctx(FakePool(rows=sample_rows(200)))
+
+    async def fetch(output_format):
+        return await server_db.execute_query(
+            "SELECT * FROM pedidos", ctx, page_size=500, output_format=output_format
+        )
+
+    async def scenario():
+        return {
+            output_format: await fetch(output_format)
+            for output_format in ("objects", "columnar", "csv", "tsv")
+        }
+
+    results = asyncio.run(scenario())
+    sizes = {name: len(json.dumps(result)) for name, result in results.items()}
+
+    # Los nombres de columna viajan una sola vez: el payload baja a menos de la mitad
+    assert sizes["columnar"] < sizes["objects"] * 0.5
+    assert sizes["csv"] < sizes["columnar"]
+    assert sizes["tsv"] < sizes["columnar"]
+
+    first = results["columnar"]["rows"][0]
+    assert first == [0, "Cliente 0", "0.99", "2025-01-01T12:00:00", "\\x00ff"]
+    assert results["objects"]["rows"][0] == dict(
+        zip(results["columnar"]["columns"], first)
+    )
+    assert results["csv"]["csv"].splitlines()[1] == (
+        "0,Cliente 0,0.99,2025-01-01T12:00:00,\\x00ff"
+    )
+
+
+def paged_plan(cost: float, inner_rows: float) -> dict:
+    # Plan de la consulta paginada: el Limit acota las filas del nodo raíz
+    return {
+        "Node Type": "Limit",
+        "Total Cost": cost,
+        "Plan Rows": 51,
+        "Plans": [
+            {
+                "Node Type": "Nested Loop",
+                "Total Cost": cost * 100,
+                "Plan Rows": inner_rows,
+                "Plans": [
+                    {"Node Type": "Seq Scan", "Plan Rows": 1000},
+                    {"Node Type": "Seq Scan", "Plan Rows": 1000},
+                ],
+            }
+        ],
+    }
+
+
+def test_check_query_cost(monkeypatch):
+    monkeypatch.setattr(server_db, "DB_MAX_QUERY_COST", 1000.0)
+    monkeypatch.setattr(server_db, "DB_MAX_QUERY_ROWS", 100000.0)
+
+    cheap = paged_plan(cost=10, inner_rows=1000)
+    costly = paged_plan(cost=5000, inner_rows=1000)
+    cross_join = paged_plan(cost=10, inner_rows=1000000)
+
+    monkeypatch.setattr(server_db, "DB_COST_GUARD", "reject")
+    assert server_db._check_query_cost(cheap) is None
+    for plan in (costly, cross_join):
+        with pytest.raises(ValueError, match="demasiado costosa"):
+            server_db._check_query_cost(plan)
+
+    monkeypatch.setattr(server_db, "DB_COST_GUARD", "warn")
+    assert server_db._check_query_cost(cheap) is None
+    assert "costo 5000" in server_db._check_query_cost(costly)
+    assert "~1000000 filas" in server_db._check_query_cost(cross_join)
+
+    monkeypatch.setattr(server_db, "DB_COST_GUARD", "off")
+    assert server_db._check_query_cost(costly) is None
+    assert server_db._check_query_cost(cross_join) is None
+
+
+def test_unordered_paging_warns():
+    ctx = make_ctx(FakePool(rows=sample_rows(10)))
+
+    async def fetch(page_size):
+        return await server_db.execute_query(
+            "SELECT * FROM pedidos", ctx, page_size=page_size
+        )
+
+    # El plan simulado no tiene Sort: se avisa solo cuando se emite un cursor
+    paged = asyncio.run(fetch(5))
+    assert paged["next_cursor"]
+    assert "orden determinista" in paged["warning"]
+    assert "warning" not in asyncio.run(fetch(50))
+
+    assert server_db._plan_is_ordered(
+        {
+            "Node Type": "Limit",
+            "Plans": [{"Node Type": "Sort", "Plans": [{"Node Type": "Seq Scan"}]}],
+        }
+    )
+    assert not server_db._plan_is_ordered(paged_plan(cost=10, inner_rows=1000))
+
+
+class StalePlanConnection(FakeConnection):
+    """Conexión del pool que aún guarda el plan de una tabla ya recreada."""
+
+    def __init__(self, rows):
+        super().__init__([], rows)
+        self.statements = []
+        self.stale = True
+
+    def cursor(self, row_factory=None):
+        connection = self
+
+        class StaleCursor(FakeCursor):
+            async def execute(self, query, params=None):
+                if connection.stale and not str(query).startswith("EXPLAIN"):
+                    raise server_db.errors.FeatureNotSupported(
+                        "cached plan must not change result type"
+                    )
+                await super().execute(query, params)
+
+        return StaleCursor(self.tables, self.rows)
+
+    async def rollback(self):
+        self.statements.append("ROLLBACK")
+
+    async def execute(self, query, params=None):
+        self.statements.append(query)
+        self.stale = False
+
+
+def test_stale_prepared_plan_is_retried_after_deallocate():
+    conn = StalePlanConnection(rows=[{"id": 1, "nueva_columna": "x"}])
+
+    class StalePool(FakePool):
+        @asynccontextmanager
+        async def connection(self):
+            yield conn
+
+    ctx = make_ctx(StalePool())
+    result = asyncio.run(server_db.execute_query("SELECT * FROM clientes", ctx))
+
+    assert result["columns"] == ["id", "nueva_columna"]
+    assert conn.statements == ["ROLLBACK", "DEALLOCATE ALL"]
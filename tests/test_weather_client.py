@@ -0,0 +1,144 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+import weather_client
+from weather_client import WeatherClient
+
+PAYLOAD = {
+    "resolvedAddress": "Madrid, España",
+    "currentConditions": {"temp": 21.3, "conditions": "Clear"},
+}
+
+
+@pytest.fixture(autouse=True)
+def fast_settings(monkeypatch):
+    # Valores bajos para que hedging, reintentos y breaker actúen en milisegundos
+    monkeypatch.setenv("WEATHER_API_KEY", "test")
+    monkeypatch.setattr(weather_client, "WEATHER_READ_TIMEOUT", 0.1)
+    monkeypatch.setattr(weather_client, "WEATHER_HEDGE_MIN_DELAY", 0.05)
+    monkeypatch.setattr(weather_client, "WEATHER_RETRIES", 2)
+    monkeypatch.setattr(weather_client, "WEATHER_RETRY_BACKOFF", 0.01)
+    monkeypatch.setattr(weather_client, "WEATHER_BREAKER_FAILURES", 2)
+    monkeypatch.setattr(weather_client, "WEATHER_BREAKER_RESET", 0.2)
+
+
+class FaultyApi:
+    """Servidor simulado: cada petición recibe la siguiente respuesta de la lista."""
+
+    def __init__(self, *faults):
+        self.faults = list(faults)
+        self.requests = 0
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        fault = self.faults.pop(0) if self.faults else 200
+
+        if isinstance(fault, float):
+            await asyncio.sleep(fault)
+            fault = 200
+
+        if fault == 200:
+            return httpx.Response(200, json=PAYLOAD)
+
+        return httpx.Response(fault, text=f"error {fault}")
+
+
+def make_client(api: FaultyApi) -> WeatherClient:
+    return WeatherClient(
+        client=httpx.AsyncClient(
+            transport=httpx.MockTransport(api), base_url="https://weather.test"
+        )
+    )
+
+
+def test_slow_request_is_hedged():
+    api = FaultyApi(1.0)
+
+    async def scenario():
+        weather = make_client(api)
+        start = time.perf_counter()
+        data = await weather._request("Madrid")
+        return data, time.perf_counter() - start
+
+    data, elapsed = asyncio.run(scenario())
+
+    # La primera petición tarda 1 s; la de respaldo sale a los 0.05 s y gana
+    assert data == PAYLOAD
+    assert api.requests == 2
+    assert elapsed < 0.5
+
+
+def test_client_error_is_not_retried():
+    api = FaultyApi(400, 400, 400)
+
+    async def scenario():
+        weather = make_client(api)
+        return weather, await weather._request("Nowhere")
+
+    weather, data = asyncio.run(scenario())
+
+    assert "400" in data["error"]
+    assert "retryable" not in data
+    assert api.requests == 1
+    assert weather.breaker.failures == 0
+
+
+def test_server_errors_are_retried(monkeypatch):
+    monkeypatch.setattr(weather_client, "WEATHER_BREAKER_FAILURES", 5)
+    api = FaultyApi(500, 503)
+
+    async def scenario():
+        weather = make_client(api)
+        return weather, await weather._request("Madrid")
+
+    weather, data = asyncio.run(scenario())
+
+    assert data == PAYLOAD
+    assert api.requests == 3
+    assert weather.breaker.failures == 0
+
+
+def test_breaker_opens_serves_stale_and_closes_after_probe(monkeypatch):
+    monkeypatch.setattr(weather_client, "WEATHER_RETRIES", 0)
+    # La entrada de la caché vence al instante: cada llamada consulta la API
+    monkeypatch.setattr(weather_client, "WEATHER_CACHE_TTL", 0)
+    monkeypatch.setattr(weather_client, "WEATHER_CACHE_STALE", 0)
+
+    api = FaultyApi(200, 500, 500, 500)
+
+    async def scenario():
+        weather = make_client(api)
+        assert await weather._get("Madrid") == PAYLOAD
+
+        # Dos fallos seguidos abren el circuito; mientras tanto se sirve la
+        # última respuesta conocida marcada como stale
+        for _ in range(2):
+            assert await weather._get("Madrid") == {**PAYLOAD, "stale": True}
+        assert weather.breaker.open
+        assert api.requests == 3
+
+        # Con el circuito abierto no se consulta la API
+        assert await weather._get("Madrid") == {**PAYLOAD, "stale": True}
+        assert api.requests == 3
+
+        # Medio abierto: pasa una sola petición de prueba; falla y se reabre
+        await asyncio.sleep(0.25)
+        probe, rejected = await asyncio.gather(
+            weather._request("Madrid"), weather._request("Sevilla")
+        )
+        assert probe["retryable"] and "500" in probe["error"]
+        assert "no está disponible" in rejected["error"]
+        assert api.requests == 4
+        assert weather.breaker.open
+
+        # La siguiente prueba sale bien y cierra el circuito
+        await asyncio.sleep(0.25)
+        assert await weather._get("Madrid") == PAYLOAD
+        assert api.requests == 5
+        assert not weather.breaker.open
+        assert weather.breaker.failures == 0
+
+    asyncio.run(scenario())